@@ -0,0 +1,382 @@
+"""
+Локальная замена tgapi.sleepagotchi.com/v1/tg для нагрузочных прогонов.
+
+Реализует все эндпоинты, которые вызывает Tapper, с игровым состоянием на
+каждого пользователя (по id из tgWebAppData), задержкой ответа и
+инъекцией 503/504. С capacity сервер держит не больше capacity запросов в
+секунду и отвечает 503 на всё сверх этого — как перегруженный живой.
+FakeTelegramClientManager подменяет MTProto-логин:
+web view отдаёт подписанную «как настоящая» строку tgWebAppData.
+
+Запуск отдельно: python -m benchmarks.mock_server --port 8765
+"""
+import argparse
+import asyncio
+import json
+import random
+from contextlib import asynccontextmanager
+from time import monotonic, time
+from types import SimpleNamespace
+from urllib.parse import parse_qs, quote
+
+from aiohttp import web
+
+HERO_CLASSES = ("warrior", "mage", "archer", "healer", "tank")
+RESOURCE_TYPES = ("gold", "greenStones", "purpleStones", "gacha", "points")
+CONSTELLATIONS = 60
+HEROES = 48
+HERO_LOCK_MS = 60 * 60 * 1000
+
+
+def now_ms() -> int:
+    return int(time() * 1000)
+
+
+def make_hero(number: int, rng: random.Random) -> dict:
+    level = rng.randint(1, 40)
+    return {
+        "heroType": f"hero{number}",
+        "name": f"Hero #{number}",
+        "description": "A sleepy hero who dreams of adventures in far-away constellations.",
+        "class": HERO_CLASSES[number % len(HERO_CLASSES)],
+        "rarity": rng.choice((0, 0, 0, 1, 2, 3)),
+        "level": level,
+        "stars": rng.randint(1, 5),
+        "power": level * 100 + rng.randint(0, 99),
+        "unlockAt": 0,
+        "costStar": rng.randint(5, 40),
+        "costLevelGold": 500 + level * 250,
+        "costLevelGreen": level * 3,
+    }
+
+
+def make_challenge(index: int, number: int, rng: random.Random) -> dict:
+    slots = rng.randint(2, 4)
+    return {
+        "challengeType": f"challenge{index}_{number}",
+        "name": f"Challenge {index}.{number}",
+        "description": "Collect resources while the heroes are sleeping.",
+        "resourceType": rng.choice(RESOURCE_TYPES),
+        "minStars": 1 + index // 20,
+        "minLevel": 5 + index // 2,
+        "received": 0,
+        "value": rng.randint(5, 50) * 100,
+        "unlockAt": 0,
+        "orderedSlots": [
+            {"slotId": slot, "heroClass": rng.choice(HERO_CLASSES), "unlocked": slot < slots - 1 or index % 2 == 0,
+             "occupiedBy": "empty"}
+            for slot in range(slots)
+        ],
+    }
+
+
+class MockPlayer:
+    def __init__(self, user_id: int):
+        rng = random.Random(user_id)
+        heroes = [make_hero(number, rng) for number in range(HEROES)]
+        heroes.append({**make_hero(HEROES, rng), "heroType": "bonk", "name": "Bonk"})
+
+        self.player = {
+            "id": user_id,
+            "meta": {
+                "constellationsLastIndex": CONSTELLATIONS - 5,
+                "freeGachaNextClaim": 0,
+                "isNextDailyRewardAvailable": True,
+            },
+            "clanInfo": {"clanId": f"clan{user_id % 10}"},
+            "resources": {
+                "gold": {"amount": rng.randint(10_000, 500_000)},
+                "gem": {"amount": rng.randint(0, 5_000)},
+                "greenStones": {"amount": rng.randint(0, 2_000)},
+                "purpleStones": {"amount": rng.randint(0, 500)},
+                "orb": {"amount": rng.randint(0, 100)},
+                "points": {"amount": rng.randint(0, 100_000)},
+                "gacha": {"amount": rng.randint(0, 3)},
+                "heroCard": [{"heroType": hero["heroType"], "amount": rng.randint(0, 50)} for hero in heroes],
+            },
+            "heroes": heroes,
+        }
+        self.constellations = [
+            {"index": index, "name": f"Constellation {index}",
+             "challenges": [make_challenge(index, number, rng) for number in range(rng.randint(2, 4))]}
+            for index in range(CONSTELLATIONS)
+        ]
+        # Первые созвездия уже пройдены — поиску стартового индекса есть что пропускать
+        for constellation in self.constellations[:rng.randint(5, 30)]:
+            for challenge in constellation["challenges"]:
+                challenge["received"] = challenge["value"]
+        self.clan = [
+            {"index": 0, "name": "Clan constellation",
+             "challenges": [{"challengeType": f"clan{number}", "name": f"Clan challenge {number}",
+                             "received": 0, "value": 10_000, "unlockAt": 0} for number in range(3)]}
+        ]
+        # Награды за отправленных героев копятся до claimChallengesRewards
+        self.unclaimed_gold = 0
+
+    def hero(self, hero_type: str) -> dict | None:
+        return next((hero for hero in self.player["heroes"] if hero["heroType"] == hero_type), None)
+
+    def release_heroes(self) -> None:
+        now = now_ms()
+        for hero in self.player["heroes"]:
+            if hero["unlockAt"] and hero["unlockAt"] <= now:
+                hero["unlockAt"] = 0
+
+
+class MockSleepagotchi:
+    """
+    Игровая логика эндпоинтов. Обработчик возвращает (status, body).
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, capacity: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.tokens_updated_at = monotonic()
+        self.players = {}
+        self.handlers = {
+            "getUserData": self.get_user_data,
+            "claimChallengesRewards": self.claim_challenges_rewards,
+            "spendGacha": self.spend_gacha,
+            "claimDailyRewards": self.claim_daily_rewards,
+            "getShop": self.get_shop,
+            "buyShop": self.buy_shop,
+            "starUpHero": self.star_up_hero,
+            "levelUpHero": self.level_up_hero,
+            "getConstellations": self.get_constellations,
+            "getClan": self.get_clan,
+            "sendToChallenge": self.send_to_challenge,
+            "sendToClanChallenge": self.send_to_clan_challenge,
+        }
+
+    def get_player(self, user_id: int) -> MockPlayer:
+        player = self.players.get(user_id)
+        if player is None:
+            player = self.players[user_id] = MockPlayer(user_id)
+        return player
+
+    def is_overloaded(self) -> bool:
+        if not self.capacity:
+            return False
+
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.tokens_updated_at) * self.capacity)
+        self.tokens_updated_at = now
+        if self.tokens < 1:
+            return True
+
+        self.tokens -= 1
+        return False
+
+    def get_user_data(self, player: MockPlayer, payload: dict):
+        player.release_heroes()
+        return 200, {"initData": {"first_name": f"Bench{player.player['id']}"}, "player": player.player}
+
+    def claim_challenges_rewards(self, player: MockPlayer, payload: dict):
+        player.release_heroes()
+        player.player["resources"]["gold"]["amount"] += player.unclaimed_gold
+        player.unclaimed_gold = 0
+        return 200, {"player": player.player}
+
+    def spend_gacha(self, player: MockPlayer, payload: dict):
+        amount = payload.get("amount", 1)
+        resources = player.player["resources"]
+        if payload.get("strategy") == "free":
+            player.player["meta"]["freeGachaNextClaim"] = now_ms() + 8 * 60 * 60 * 1000
+        elif resources["gacha"]["amount"] < amount:
+            return 400, {"error": "not enough gacha"}
+        else:
+            resources["gacha"]["amount"] -= amount
+
+        cards = random.sample(resources["heroCard"], k=min(amount, len(resources["heroCard"])))
+        for card in cards:
+            card["amount"] += 1
+        return 200, {"heroCard": [{"heroType": card["heroType"], "amount": 1} for card in cards]}
+
+    def claim_daily_rewards(self, player: MockPlayer, payload: dict):
+        meta = player.player["meta"]
+        if not meta["isNextDailyRewardAvailable"]:
+            return 400, {"error": "already claimed"}
+        meta["isNextDailyRewardAvailable"] = False
+        player.player["resources"]["gem"]["amount"] += 100
+        return 200, {"rewards": {"rewardType": "gem", "rewardAmount": 100}}
+
+    def get_shop(self, player: MockPlayer, payload: dict):
+        shop = player.player.setdefault("shop", [
+            {"slotType": "free", "nextClaimAt": 0},
+            {"slotType": "gold", "nextClaimAt": 0, "price": 1000},
+            {"slotType": "gem", "nextClaimAt": 0, "price": 50},
+        ])
+        return 200, {"shop": shop}
+
+    def buy_shop(self, player: MockPlayer, payload: dict):
+        for slot in player.player.get("shop", []):
+            if slot["slotType"] == payload.get("slotType"):
+                slot["nextClaimAt"] = now_ms() + 24 * 60 * 60 * 1000
+                return 200, {"player": player.player}
+        return 400, {"error": "unknown slot"}
+
+    def star_up_hero(self, player: MockPlayer, payload: dict):
+        hero = player.hero(payload.get("heroType"))
+        card = next((card for card in player.player["resources"]["heroCard"]
+                     if hero and card["heroType"] == hero["heroType"]), None)
+        if hero is None or card is None or card["amount"] < hero["costStar"]:
+            return 400, {"error": "not enough cards"}
+        card["amount"] -= hero["costStar"]
+        hero["stars"] += 1
+        hero["costStar"] *= 2
+        return 200, {"hero": hero}
+
+    def level_up_hero(self, player: MockPlayer, payload: dict):
+        hero = player.hero(payload.get("heroType"))
+        resources = player.player["resources"]
+        if hero is None or resources["gold"]["amount"] < hero["costLevelGold"] or \
+                resources["greenStones"]["amount"] < hero["costLevelGreen"]:
+            return 400, {"error": "not enough resources"}
+        spent = hero["costLevelGold"]
+        resources["gold"]["amount"] -= spent
+        resources["greenStones"]["amount"] -= hero["costLevelGreen"]
+        hero["level"] += 1
+        hero["costLevelGold"] += 250
+        hero["costLevelGreen"] += 3
+        return 200, {"hero": hero, "spentGold": spent}
+
+    def get_constellations(self, player: MockPlayer, payload: dict):
+        start = payload.get("startIndex", 0)
+        return 200, {"constellations": player.constellations[start:start + payload.get("amount", 5)]}
+
+    def get_clan(self, player: MockPlayer, payload: dict):
+        return 200, {"clanId": payload.get("clanId"), "constellations": player.clan}
+
+    def send_to_challenge(self, player: MockPlayer, payload: dict):
+        challenge, constellation = next(
+            ((challenge, constellation) for constellation in player.constellations
+             for challenge in constellation["challenges"] if challenge["challengeType"] == payload.get("challengeType")),
+            (None, None))
+        if challenge is None:
+            return 400, {"error": "unknown challenge"}
+
+        slots = {slot["slotId"]: slot for slot in challenge["orderedSlots"]}
+        for assigned in payload.get("heroes", []):
+            hero = player.hero(assigned["heroType"])
+            slot = slots.get(assigned["slotId"])
+            if hero is None or slot is None or hero["unlockAt"] or slot["occupiedBy"] != "empty":
+                return 400, {"error": "hero or slot is busy"}
+            hero["unlockAt"] = now_ms() + HERO_LOCK_MS
+            slot["occupiedBy"] = hero["heroType"]
+            challenge["received"] = min(challenge["value"], challenge["received"] + hero["power"])
+            player.unclaimed_gold += hero["power"]
+
+        return 200, {"player": player.player, "constellations": [constellation]}
+
+    def send_to_clan_challenge(self, player: MockPlayer, payload: dict):
+        hero = player.hero("bonk")
+        if hero["unlockAt"]:
+            return 400, {"error": "bonk is busy"}
+        hero["unlockAt"] = now_ms() + HERO_LOCK_MS
+        return 200, {"player": player.player}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.is_overloaded():
+            return web.Response(status=503, text="Service Unavailable")
+
+        # Задержка с длинным хвостом, как у живого сервера
+        await asyncio.sleep(random.lognormvariate(0, 0.5) * self.latency)
+
+        if self.error_rate and random.random() < self.error_rate:
+            return web.Response(status=random.choice((503, 504)), text="Service Unavailable")
+
+        handler = self.handlers.get(request.match_info["endpoint"])
+        if handler is None:
+            return web.json_response({"error": "not found"}, status=404)
+
+        try:
+            user = json.loads(parse_qs(request.query_string)["user"][0])
+        except (KeyError, ValueError):
+            return web.json_response({"error": "unauthorized"}, status=401)
+
+        payload = await request.json() if request.can_read_body else {}
+        status, body = handler(self.get_player(user["id"]), payload or {})
+        return web.json_response(body, status=status)
+
+
+def make_app(latency: float = 0.05, error_rate: float = 0.0, capacity: float = 0.0) -> web.Application:
+    game = MockSleepagotchi(latency=latency, error_rate=error_rate, capacity=capacity)
+    app = web.Application()
+    app["game"] = game
+    app.router.add_route("*", "/v1/tg/{endpoint}", game.handle)
+    return app
+
+
+def run_server(host: str, port: int, latency: float, error_rate: float, capacity: float = 0.0) -> None:
+    web.run_app(make_app(latency, error_rate, capacity), host=host, port=port, access_log=None, print=None)
+
+
+def make_tg_web_data(user_id: int) -> str:
+    user = json.dumps({"id": user_id, "first_name": f"Bench{user_id}", "last_name": "", "username": f"bench{user_id}"})
+    return (f"query_id=AA{user_id}&user={quote(user)}&auth_date={int(time())}"
+            f"&chat_instance={user_id}&hash={random.getrandbits(128):032x}")
+
+
+class FakeTelegramClient:
+    """
+    Ровно то, что нужно Tapper.get_tg_web_data: resolve_peer, invoke(RequestAppWebView), get_me.
+    """
+
+    def __init__(self, user_id: int, login_latency: float):
+        self.user_id = user_id
+        self.login_latency = login_latency
+        self.is_connected = True
+
+    async def resolve_peer(self, username: str):
+        from pyrogram.raw import types
+
+        return types.InputPeerUser(user_id=1, access_hash=1)
+
+    async def invoke(self, request):
+        await asyncio.sleep(self.login_latency)
+        url = (f"https://tgcf.sleepagotchi.com/#tgWebAppData={quote(make_tg_web_data(self.user_id))}"
+               f"&tgWebAppVersion=7.10&tgWebAppPlatform=android")
+        return SimpleNamespace(url=url)
+
+    async def get_me(self):
+        return SimpleNamespace(id=self.user_id, first_name=f"Bench{self.user_id}", last_name="",
+                               username=f"bench{self.user_id}")
+
+
+class FakeTelegramClientManager:
+    """
+    Замена TelegramClientManager: у каждой сессии свой фейковый клиент без сети.
+    """
+
+    def __init__(self, session_names: list[str], login_latency: float = 0.2):
+        self.session_names = session_names
+        self.clients = {session_name: FakeTelegramClient(number + 1, login_latency)
+                        for number, session_name in enumerate(session_names)}
+
+    @asynccontextmanager
+    async def connection(self, session_name: str):
+        # Как у TelegramClientManager: Tapper.get_tg_web_data импортирует pyrogram.raw внутри подключения
+        from bot.core.connections import preload_pyrogram
+
+        await preload_pyrogram()
+        yield self.clients[session_name]
+
+    async def run_idle_reaper(self) -> None:
+        await asyncio.Event().wait()
+
+    async def close(self) -> None:
+        self.clients.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Median response latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503/504 responses")
+    parser.add_argument("--capacity", type=float, default=0.0, help="Requests per second before 503 (0 — no limit)")
+    args = parser.parse_args()
+
+    run_server(args.host, args.port, args.latency, args.error_rate, args.capacity)
@@ -0,0 +1,113 @@
+"""
+Память и CPU: сырые словари ответов против моделей из bot.core.models.
+
+    python -m benchmarks.models --accounts 1000
+
+Для каждого аккаунта генерируются ответы getUserData и getConstellations
+(как у mock-сервера); меряется объём удерживаемых объектов (tracemalloc) и
+время типичного прохода цикла: фильтр свободных героев, доступных
+испытаний и кандидатов на прокачку. Сырые словари читаются stdlib json, как
+раньше, модели — тем же loads, что и клиент API (orjson, если установлен).
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.mock_server import MockPlayer
+from bot.core.models import Constellation, Player, loads
+
+
+def make_payloads(accounts: int) -> list[tuple[str, str]]:
+    payloads = []
+    for user_id in range(1, accounts + 1):
+        player = MockPlayer(user_id)
+        payloads.append((json.dumps({"player": player.player}), json.dumps({"constellations": player.constellations})))
+    return payloads
+
+
+def walk_raw(user: dict, constellations: list[dict]) -> int:
+    player = user["player"]
+    resources = player["resources"]
+    heroes = [hero for hero in player["heroes"] if hero["unlockAt"] == 0 and hero["heroType"] != "bonk"]
+    challenges = [challenge for constellation in constellations for challenge in constellation["challenges"]
+                  if challenge["unlockAt"] == 0 and challenge["received"] < challenge["value"]]
+    candidates = [hero for hero in heroes
+                  if hero["level"] < 30 and hero["costLevelGold"] <= resources.get("gold", {}).get("amount", 0)]
+    return len(heroes) + len(challenges) + len(candidates)
+
+
+def walk_models(player: Player, constellations: list[Constellation]) -> int:
+    heroes = [hero for hero in player.heroes if hero.unlock_at == 0 and hero.hero_type != "bonk"]
+    challenges = [challenge for constellation in constellations for challenge in constellation.challenges
+                  if challenge.unlock_at == 0 and not challenge.is_complete]
+    gold = player.resources.amount("gold")
+    candidates = [hero for hero in heroes if hero.level < 30 and hero.cost_level_gold <= gold]
+    return len(heroes) + len(challenges) + len(candidates)
+
+
+def measure_time(decode, walk, payloads) -> tuple[float, float]:
+    # Мусор предыдущего замера не должен попадать в сборки этого
+    gc.collect()
+    started = perf_counter()
+    decoded = [decode(user, constellations) for user, constellations in payloads]
+    decode_time = perf_counter() - started
+
+    started = perf_counter()
+    for user, constellations in decoded:
+        walk(user, constellations)
+    return decode_time, perf_counter() - started
+
+
+def measure_memory(decode, payloads) -> int:
+    # Отдельным проходом: tracemalloc сильно замедляет декодирование
+    gc.collect()
+    tracemalloc.start()
+    decoded = [decode(user, constellations) for user, constellations in payloads]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del decoded
+    return retained
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3, help="Timing rounds; the best one is reported")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.accounts)
+    layouts = {
+        "raw dicts": (lambda user, constellations: (json.loads(user), json.loads(constellations)["constellations"]),
+                      walk_raw),
+        "models": (lambda user, constellations: (Player.from_dict(loads(user)["player"]),
+                                                 Constellation.from_list(loads(constellations)["constellations"])),
+                   walk_models),
+    }
+
+    # Раскладки чередуются: первый проход платит за прогрев, лучший из раундов честнее
+    times = {name: [] for name in layouts}
+    for _ in range(args.rounds):
+        for name, (decode, walk) in layouts.items():
+            times[name].append(measure_time(decode, walk, payloads))
+
+    reports = {}
+    for name, (decode, _) in layouts.items():
+        decode_time = min(decode_time for decode_time, _ in times[name])
+        walk_time = min(walk_time for _, walk_time in times[name])
+        reports[name] = {
+            "retained_kb_per_account": round(measure_memory(decode, payloads) / len(payloads) / 1024, 1),
+            "decode_ms_per_account": round(decode_time / len(payloads) * 1000, 3),
+            "walk_ms_per_account": round(walk_time / len(payloads) * 1000, 3),
+            "cycle_ms_per_account": round((decode_time + walk_time) / len(payloads) * 1000, 3),
+        }
+
+    print(f"models decode with {loads.__module__}.loads")
+    print(f"{'':<26} {'raw dicts':>12} {'models':>12}")
+    for key in reports["raw dicts"]:
+        print(f"{key:<26} {reports['raw dicts'][key]:>12} {reports['models'][key]:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Прогон Tapper.run на записанных ответах API без сети — для профилирования
+логики цикла (выбор героев, обход созвездий, прокачка) и сравнения CPU-времени
+между версиями.
+
+    API_MODE=record python main.py -a 1                       # записать архив
+    python -m benchmarks.replay api_archive.jsonl.gz --profile cycle.prof
+
+Каждая сессия из архива проходит --cycles циклов по очереди; random
+фиксируется --seed, паузы внутри цикла отключены. API_REPLAY_TIMING=true
+воспроизводит ещё и записанные задержки ответов.
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import random
+import tempfile
+from time import process_time
+
+from benchmarks.run import percentile, scale_sleep
+
+
+async def replay_cycles(args) -> dict:
+    from types import SimpleNamespace
+
+    # Как в main.py: bot.utils (вместе с launcher) импортируется раньше bot.core,
+    # иначе цикл bot.core -> bot.utils -> launcher -> bot.core
+    import bot.utils  # noqa: F401
+    import bot.core.tapper as tapper_module
+    from bot.core.actions import ACTION_SYNC
+    from bot.core.replay import close_api_archive, get_api_archive
+    from bot.core.state_store import close_state_store
+    from bot.core.tapper import Tapper, run_tapper
+    from benchmarks.mock_server import FakeTelegramClientManager
+
+    tapper_module.asyncio = SimpleNamespace(**{**vars(asyncio), "sleep": scale_sleep(0)})
+
+    session_names = get_api_archive().session_names
+    if args.session:
+        session_names = [session_name for session_name in session_names if session_name in args.session]
+
+    tg_clients = FakeTelegramClientManager(session_names, login_latency=0)
+    profiler = cProfile.Profile() if args.profile else None
+
+    cycle_times = []
+    slowest = (0.0, None)
+    try:
+        for session_name in session_names:
+            tapper = Tapper(session_name=session_name, tg_clients=tg_clients)
+            for cycle in range(args.cycles):
+                # Как в benchmarks.run: каждый цикл — полная синхронизация, не дожидаясь сроков действий
+                tapper.wake_at = None
+                tapper.actions.set_due(ACTION_SYNC, 0)
+                started = process_time()
+                if profiler is not None:
+                    profiler.enable()
+                next_run = await run_tapper(tapper)
+                if profiler is not None:
+                    profiler.disable()
+
+                cpu_time = process_time() - started
+                cycle_times.append(cpu_time)
+                if cpu_time > slowest[0]:
+                    slowest = (cpu_time, f"{session_name}#{cycle + 1}")
+                if next_run is None:
+                    break
+    finally:
+        close_api_archive()
+        close_state_store()
+
+    if profiler is not None:
+        profiler.dump_stats(args.profile)
+
+    return {
+        "sessions": len(session_names),
+        "cycles": len(cycle_times),
+        "cpu_total_ms": round(sum(cycle_times) * 1000, 2),
+        "cpu_cycle_p50_ms": round(percentile(cycle_times, 50) * 1000, 2),
+        "cpu_cycle_max_ms": round(slowest[0] * 1000, 2),
+        "slowest_cycle": slowest[1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("archive", help="Archive written with API_MODE=record")
+    parser.add_argument("--cycles", type=int, default=1, help="Cycles per session")
+    parser.add_argument("--session", action="append", help="Replay only these sessions")
+    parser.add_argument("--profile", help="Write cProfile stats to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as one JSON line")
+    parser.add_argument("--verbose", action="store_true", help="Keep the bot's INFO logs")
+    args = parser.parse_args()
+
+    archive = os.path.abspath(args.archive)
+    if args.profile:
+        args.profile = os.path.abspath(args.profile)
+    workdir = tempfile.mkdtemp(prefix="sleepagotchi-replay-")
+
+    os.environ.update({
+        "API_MODE": "replay",
+        "API_ARCHIVE_PATH": archive,
+        "STATE_DB_PATH": os.path.join(workdir, "state.db"),
+        "USE_RANDOM_DELAY_IN_RUN": "false",
+        "LEVEL_UP_DELAY": "[0, 0]",
+        "DISPLAY_MODE": "log",
+        "LOG_LEVEL": "INFO" if args.verbose else "ERROR",
+    })
+    os.environ.setdefault("API_ID", "1")
+    os.environ.setdefault("API_HASH", "replay")
+    os.chdir(workdir)
+    random.seed(args.seed)
+
+    report = asyncio.run(replay_cycles(args))
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:<18} {value}")
+
+
+if __name__ == "__main__":
+    main()
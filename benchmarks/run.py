@@ -0,0 +1,218 @@
+"""
+Сквозной бенчмарк: N синтетических аккаунтов проходят полные циклы Tapper.run
+против локального mock-сервера.
+
+    python -m benchmarks.run --accounts 200 --cycles 3 --latency 0.05 --error-rate 0.02
+    python -m benchmarks.run --accounts 500 --capacity 100        # сервер держит 100 rps
+
+Отчёт: циклы в секунду, p50/p99 задержки запросов, задержка цикла событий, RSS
+и время от импорта бота до первого ответа API (холодный старт).
+--json печатает тот же отчёт одной строкой для сравнения между прогонами.
+Фиксированные паузы внутри цикла масштабируются --delay-scale (0 — без пауз).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+from statistics import quantiles
+from time import perf_counter
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def get_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+async def wait_for_port(host: str, port: int, timeout: float = 10) -> None:
+    deadline = perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def measure_loop_lag(samples: list[float], interval: float = 0.05) -> None:
+    while True:
+        started = perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(perf_counter() - started - interval)
+
+
+def scale_sleep(delay_scale: float):
+    original_sleep = asyncio.sleep
+
+    async def sleep(delay, *args, **kwargs):
+        return await original_sleep(delay * delay_scale, *args, **kwargs)
+
+    return sleep
+
+
+async def run_benchmark(args) -> dict:
+    from types import SimpleNamespace
+
+    # Холодный старт считается с импорта бота: в этом процессе он ещё не загружен
+    import_started = perf_counter()
+    # Как в main.py: bot.utils (вместе с launcher) импортируется раньше bot.core,
+    # иначе цикл bot.core -> bot.utils -> launcher -> bot.core
+    import bot.utils  # noqa: F401
+    import bot.core.tapper as tapper_module
+    from bot.core.actions import ACTION_SYNC
+    from bot.core.api import endpoint_stats
+    from bot.core.connections import preload_pyrogram
+    from bot.core.http_client import close_http_client, preload_http_client
+    from bot.core.state_store import close_state_store
+    from bot.core.tapper import Tapper, run_tapper
+    from benchmarks.mock_server import FakeTelegramClientManager
+
+    # Паузы «как у человека» масштабируются только внутри Tapper
+    tapper_module.asyncio = SimpleNamespace(**{**vars(asyncio), "sleep": scale_sleep(args.delay_scale)})
+
+    # Как в run_tasks: aiocfscrape грузится в потоке, пока аккаунты создаются и логинятся
+    preload_http_client()
+
+    session_names = [f"bench{number:05d}" for number in range(args.accounts)]
+    tg_clients = FakeTelegramClientManager(session_names, login_latency=args.login_latency)
+    tappers = [Tapper(session_name=session_name, tg_clients=tg_clients) for session_name in session_names]
+    if not all(tapper.has_valid_auth() for tapper in tappers):
+        preload_pyrogram()
+
+    latencies = []
+    first_response_at = None
+    for tapper in tappers:
+        request = tapper.api.request
+
+        async def timed_request(endpoint, query, payload=None, request=request):
+            nonlocal first_response_at
+            result = await request(endpoint, query, payload)
+            if first_response_at is None:
+                first_response_at = perf_counter()
+            latencies.append(result.elapsed)
+            return result
+
+        tapper.api.request = timed_request
+
+    async def drive(tapper) -> int:
+        completed = 0
+        for _ in range(args.cycles):
+            # Каждый прогон — полная синхронизация, не дожидаясь сроков действий
+            tapper.wake_at = None
+            tapper.actions.set_due(ACTION_SYNC, 0)
+            if await run_tapper(tapper) is None:
+                break
+            completed += 1
+        return completed
+
+    loop_lag = []
+    lag_task = asyncio.create_task(measure_loop_lag(loop_lag))
+    started = perf_counter()
+    try:
+        cycles = sum(await asyncio.gather(*(drive(tapper) for tapper in tappers)))
+    finally:
+        elapsed = perf_counter() - started
+        lag_task.cancel()
+        await close_http_client()
+        close_state_store()
+
+    return {
+        "accounts": args.accounts,
+        "first_request_ms": round((first_response_at - import_started) * 1000, 1) if first_response_at else None,
+        "cycles": cycles,
+        "elapsed": round(elapsed, 3),
+        "cycles_per_sec": round(cycles / elapsed, 3) if elapsed else 0.0,
+        "requests": len(latencies),
+        "retries": sum(stats.retries for stats in endpoint_stats.values()),
+        "failed_requests": sum(stats.errors for stats in endpoint_stats.values()),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(loop_lag, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(loop_lag, default=0) * 1000, 2),
+        "rss_mb": round(get_rss_mb(), 1),
+    }
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--cycles", type=int, default=3, help="Cycles per account")
+    parser.add_argument("--latency", type=float, default=0.05, help="Median mock response latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503/504 responses")
+    parser.add_argument("--capacity", type=float, default=0.0, help="Mock server requests per second (0 — no limit)")
+    parser.add_argument("--login-latency", type=float, default=0.2, help="Fake web-view login latency, seconds")
+    parser.add_argument("--delay-scale", type=float, default=0.0, help="Multiplier for in-cycle pauses")
+    parser.add_argument("--port", type=int, default=0, help="Mock server port (0 — any free port)")
+    parser.add_argument("--json", action="store_true", help="Print the report as one JSON line")
+    parser.add_argument("--verbose", action="store_true", help="Keep the bot's INFO logs")
+    args = parser.parse_args()
+
+    port = args.port or get_free_port()
+    workdir = tempfile.mkdtemp(prefix="sleepagotchi-bench-")
+
+    # Настройки бота читаются при импорте — окружение готовим до него
+    os.environ.update({
+        "API_URL": f"http://127.0.0.1:{port}/v1/tg",
+        "STATE_DB_PATH": os.path.join(workdir, "state.db"),
+        "USE_RANDOM_DELAY_IN_RUN": "false",
+        "LEVEL_UP_DELAY": "[0, 0]",
+        "API_BACKOFF_BASE": "0.1",
+        "DISPLAY_MODE": "log",
+        "LOG_LEVEL": "INFO" if args.verbose else "ERROR",
+    })
+    os.environ.setdefault("API_ID", "1")
+    os.environ.setdefault("API_HASH", "benchmark")
+    # Рабочая папка временная, чтобы не тронуть sessions/ и min_index.json пользователя
+    os.chdir(workdir)
+
+    from benchmarks.mock_server import run_server
+
+    server = multiprocessing.get_context("spawn").Process(
+        target=run_server, args=("127.0.0.1", port, args.latency, args.error_rate, args.capacity), daemon=True)
+    server.start()
+
+    try:
+        asyncio.run(wait_for_port("127.0.0.1", port))
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        server.terminate()
+        server.join()
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:<18} {value}")
+
+
+if __name__ == "__main__":
+    main()
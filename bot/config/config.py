@@ -12,6 +12,84 @@ class Settings(BaseSettings):
     USE_RANDOM_DELAY_IN_RUN: bool = True
     RANDOM_DELAY_IN_RUN: list[int] = [1, 5]
 
+    HTTP_POOL_SIZE: int = 100
+    HTTP_KEEPALIVE_TIMEOUT: int = 60
+    HTTP_DNS_CACHE_TTL: int = 600
+    HTTP_TIMEOUT: int = 30
+
+    API_URL: str = "https://tgapi.sleepagotchi.com/v1/tg"
+    API_MAX_ATTEMPTS: int = 3
+    API_BACKOFF_BASE: float = 1.0
+    API_BACKOFF_MAX: float = 30.0
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_RPS: float = 0.0
+    RATE_LIMIT_MIN_RPS: float = 0.5
+    RATE_LIMIT_MAX_RPS: float = 0.0
+    RATE_LIMIT_GLOBAL_RPS: float = 0.0
+    RATE_LIMIT_BURST: int = 5
+    RATE_LIMIT_INCREASE: float = 0.1
+    RATE_LIMIT_DECREASE: float = 0.5
+    RATE_LIMIT_COOLDOWN: float = 2.0
+
+    CIRCUIT_ENABLED: bool = True
+    CIRCUIT_FAILURE_THRESHOLD: int = 20
+    CIRCUIT_OPEN_TIMEOUT: float = 30
+    CIRCUIT_OPEN_TIMEOUT_MAX: float = 600
+    CIRCUIT_HALF_OPEN_PROBES: int = 3
+
+    API_MODE: str = "live"
+    API_ARCHIVE_PATH: str = "api_archive.jsonl.gz"
+    API_REPLAY_TIMING: bool = False
+
+    STATE_DB_PATH: str = "state.db"
+    STATE_FLUSH_INTERVAL: int = 5
+    STATE_FLUSH_BATCH: int = 100
+
+    CONSTELLATION_CACHE_TTL: int = 600
+    START_INDEX_DISCOVERY: str = "bisect"
+    START_INDEX_PAGE_SIZE: int = 10
+
+    LEVEL_UP_STRATEGY: str = "one"
+    LEVEL_UP_DELAY: list[float] = [0.3, 1]
+    ACTION_DELAY: list[float] = [0.5, 1.5]
+    ACCOUNT_MAX_CONCURRENCY: int = 4
+    SYNC_INTERVAL: int = 14400
+    ACTION_RETRY_DELAY: list[int] = [30, 90]
+
+    EARLY_WAKEUP_TOLERANCE: float = 1.0
+
+    AUTH_TOKEN_TTL: int = 3600
+    AUTH_REFRESH_MARGIN: int = 300
+
+    TG_MAX_CONNECTIONS: int = 20
+    TG_IDLE_TIMEOUT: int = 120
+    TG_STARTUP_SPACING: float = 0.5
+    TG_STARTUP_WINDOW_MAX: int = 600
+
+    SESSION_CHECK_ENABLED: bool = True
+    SESSION_CHECK_CONCURRENCY: int = 10
+    SESSION_CHECK_TTL: int = 86400
+
+    DISPLAY_MODE: str = "dashboard"
+    DISPLAY_TIMEZONE: str = "Europe/Kyiv"
+    DASHBOARD_REFRESH_INTERVAL: float = 1.0
+
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: dict[str, str] = {}
+    LOG_FORMAT: str = "text"
+    LOG_ENQUEUE: bool = True
+    LOG_BATCH_SIZE: int = 50
+    LOG_FLUSH_INTERVAL: float = 0.5
+
+    WORKERS: int = 1
+    WORKER_STATUS_INTERVAL: float = 1.0
+    WORKER_RESTART_DELAY: float = 5
+
+    METRICS_ENABLED: bool = False
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9108
+
 
 
 settings = Settings()
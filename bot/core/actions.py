@@ -0,0 +1,55 @@
+"""
+Расписание действий одного аккаунта.
+
+Каждое действие — полная синхронизация, бесплатная гача, бесплатный слот
+магазина, испытания — отдельная запись со своим сроком (мс по часам
+сервера) и условием запуска. Аккаунт просыпается к ближайшему сроку и
+выполняет только созревшие действия, а не весь цикл целиком.
+"""
+
+ACTION_SYNC = "sync"
+ACTION_GACHA = "gacha"
+ACTION_SHOP = "shop"
+ACTION_CHALLENGES = "challenges"
+
+
+class Action:
+    __slots__ = ("name", "func", "precondition", "due_at")
+
+    def __init__(self, name: str, func, precondition=None, due_at: int | None = None):
+        self.name = name
+        self.func = func
+        self.precondition = precondition
+        self.due_at = due_at
+
+
+class ActionSchedule:
+    """
+    Действия выполняются в порядке регистрации. Срок None — действие ждёт,
+    пока другое (обычно синхронизация) не назначит ему срок.
+    """
+
+    def __init__(self):
+        self.actions: dict[str, Action] = {}
+
+    def register(self, name: str, func, precondition=None, due_at: int | None = None) -> None:
+        self.actions[name] = Action(name, func, precondition, due_at)
+
+    def set_due(self, name: str, due_at: int | None) -> None:
+        self.actions[name].due_at = due_at
+
+    def due(self, now_ms: int) -> list[Action]:
+        ready = []
+        for action in self.actions.values():
+            if action.due_at is None or action.due_at > now_ms:
+                continue
+            if action.precondition is not None and not action.precondition():
+                # Без нужных данных действие бессмысленно — срок назначит синхронизация
+                action.due_at = None
+                continue
+            ready.append(action)
+        return ready
+
+    def next_due(self) -> Action | None:
+        scheduled = [action for action in self.actions.values() if action.due_at is not None]
+        return min(scheduled, key=lambda action: action.due_at) if scheduled else None
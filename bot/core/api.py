@@ -0,0 +1,265 @@
+import asyncio
+import random
+from bisect import bisect_left
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import perf_counter, time
+
+import aiohttp
+
+from bot.config import settings
+from bot.core.circuit_breaker import get_circuit_breaker
+from bot.core.clock import get_server_clock
+from bot.core.http_client import get_http_client
+from bot.core.models import loads
+from bot.core.rate_limiter import get_rate_limiter
+from bot.core.replay import API_MODE_REPLAY, get_api_archive
+from bot.utils import logger
+
+GET_ENDPOINTS = {
+    "getUserData",
+    "getAllHeroes",
+    "getShop",
+    "getDailyRewards",
+    "claimDailyRewards",
+    "claimChallengesRewards",
+}
+
+ERROR_UNAVAILABLE = "unavailable"
+ERROR_NETWORK = "network"
+ERROR_AUTH = "auth"
+ERROR_CLIENT = "client"
+ERROR_SERVER = "server"
+ERROR_INVALID_RESPONSE = "invalid_response"
+ERROR_CIRCUIT_OPEN = "circuit_open"
+
+RETRYABLE_ERRORS = (ERROR_UNAVAILABLE, ERROR_NETWORK)
+
+
+class ApiResult:
+    __slots__ = ("endpoint", "data", "status", "error", "error_kind", "attempts", "elapsed")
+
+    def __init__(self, endpoint: str, data=None, status: int | None = None, error: str | None = None,
+                 error_kind: str | None = None, attempts: int = 1, elapsed: float = 0.0):
+        self.endpoint = endpoint
+        self.data = data
+        self.status = status
+        self.error = error
+        self.error_kind = error_kind
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error_kind is None
+
+    @property
+    def is_unavailable(self) -> bool:
+        return self.error_kind in RETRYABLE_ERRORS or self.error_kind == ERROR_CIRCUIT_OPEN
+
+    def __repr__(self) -> str:
+        if self.ok:
+            return f"ApiResult({self.endpoint}, status={self.status}, attempts={self.attempts})"
+        return f"ApiResult({self.endpoint}, error={self.error_kind}: {self.error}, attempts={self.attempts})"
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class EndpointStats:
+    """
+    Счётчики по одному эндпоинту. Задержка считается по каждой попытке отдельно,
+    время ожидания между повторами копится в retry_wait. latency_counts —
+    гистограмма задержек по LATENCY_BUCKETS, последний элемент — всё, что выше.
+    """
+    __slots__ = ("requests", "errors", "retries", "latency_total", "latency_max", "retry_wait", "latency_counts")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.retry_wait = 0.0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, latency: float) -> None:
+        self.requests += 1
+        self.latency_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.requests if self.requests else 0.0
+
+
+endpoint_stats: dict[str, EndpointStats] = {}
+
+
+def get_endpoint_stats(endpoint: str) -> EndpointStats:
+    stats = endpoint_stats.get(endpoint)
+    if stats is None:
+        stats = endpoint_stats[endpoint] = EndpointStats()
+    return stats
+
+
+def classify_status(status: int) -> str | None:
+    if status < 400:
+        return None
+    if status in (429, 502, 503, 504):
+        return ERROR_UNAVAILABLE
+    if status in (401, 403):
+        return ERROR_AUTH
+    if status < 500:
+        return ERROR_CLIENT
+    return ERROR_SERVER
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class SleepagotchiApi:
+    """
+    Клиент API Sleepagotchi с единой политикой повторов.
+
+    Повторяются только 429/502/503/504 и сетевые ошибки: экспоненциальная
+    задержка с полным джиттером либо значение из Retry-After. Одновременно
+    выполняется не больше ACCOUNT_MAX_CONCURRENCY запросов аккаунта, каждая
+    попытка берёт токен из общего для всех аккаунтов RateLimiter. Пока общий
+    CircuitBreaker открыт, запрос сразу завершается ошибкой circuit_open.
+    """
+
+    def __init__(self, session_name: str, max_attempts: int | None = None,
+                 backoff_base: float | None = None, backoff_max: float | None = None):
+        self.session_name = session_name
+        self.max_attempts = max_attempts or settings.API_MAX_ATTEMPTS
+        self.backoff_base = backoff_base or settings.API_BACKOFF_BASE
+        self.backoff_max = backoff_max or settings.API_BACKOFF_MAX
+        self.semaphore = asyncio.Semaphore(settings.ACCOUNT_MAX_CONCURRENCY)
+
+    def get_backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, endpoint: str, query: str, payload: dict | None = None) -> ApiResult:
+        async with self.semaphore:
+            return await self.dispatch(endpoint, query, payload)
+
+    async def dispatch(self, endpoint: str, query: str, payload: dict | None = None) -> ApiResult:
+        archive = get_api_archive()
+        if archive is None:
+            return await self.send(endpoint, query, payload)
+
+        if settings.API_MODE == API_MODE_REPLAY:
+            return await self.replay(archive, endpoint)
+
+        result = await self.send(endpoint, query, payload)
+        archive.record(self.session_name, endpoint, payload,
+                       {field: getattr(result, field) for field in ApiResult.__slots__ if field != "endpoint"})
+        return result
+
+    async def replay(self, archive, endpoint: str) -> ApiResult:
+        recorded = archive.next(self.session_name, endpoint)
+        if recorded is None:
+            return ApiResult(endpoint, error="no recorded response", error_kind=ERROR_NETWORK, attempts=0)
+
+        if settings.API_REPLAY_TIMING:
+            await asyncio.sleep(recorded["elapsed"])
+
+        return ApiResult(endpoint, **{field: recorded[field] for field in ApiResult.__slots__ if field != "endpoint"})
+
+    async def send(self, endpoint: str, query: str, payload: dict | None = None) -> ApiResult:
+        url = f"{settings.API_URL}/{endpoint}?{query}"
+        method = "GET" if endpoint in GET_ENDPOINTS else "POST"
+        stats = get_endpoint_stats(endpoint)
+        limiter = get_rate_limiter() if settings.RATE_LIMIT_ENABLED else None
+        breaker = get_circuit_breaker() if settings.CIRCUIT_ENABLED else None
+        started = perf_counter()
+
+        status = error = error_kind = None
+        attempt = 0
+        for attempt in range(1, self.max_attempts + 1):
+            retry_after = None
+            if breaker is not None and not breaker.allow():
+                status, error_kind, error = None, ERROR_CIRCUIT_OPEN, "circuit is open"
+                attempt -= 1
+                break
+
+            try:
+                if limiter is not None:
+                    await limiter.acquire(endpoint)
+
+                http_client = await get_http_client()
+                attempt_started = perf_counter()
+                sent_at = time()
+                async with http_client.request(method, url, json=payload) as response:
+                    get_server_clock().observe(response.headers.get("Date"), sent_at, time())
+                    status = response.status
+                    error_kind = classify_status(status)
+                    if error_kind is None:
+                        data = await response.json(content_type=None, loads=loads)
+                        stats.observe(perf_counter() - attempt_started)
+                        if limiter is not None:
+                            limiter.on_success(endpoint)
+                        if breaker is not None:
+                            breaker.record_success()
+                        return ApiResult(endpoint, data=data, status=status, attempts=attempt,
+                                         elapsed=perf_counter() - started)
+
+                    error = f"{status}, message='{response.reason}'"
+                    if limiter is not None and error_kind == ERROR_UNAVAILABLE:
+                        limiter.on_overload(endpoint)
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except asyncio.TimeoutError:
+                status, error_kind, error = None, ERROR_NETWORK, "request timed out"
+            except aiohttp.ClientError as e:
+                status, error_kind, error = None, ERROR_NETWORK, str(e) or e.__class__.__name__
+            except ValueError as e:
+                error_kind, error = ERROR_INVALID_RESPONSE, str(e)
+            except BaseException:
+                # Отмена или непредвиденная ошибка: исход попытки не записан — пробу нужно вернуть,
+                # иначе полуоткрытый предохранитель так и не закроется
+                if breaker is not None:
+                    breaker.release()
+                raise
+
+            stats.observe(perf_counter() - attempt_started)
+            if breaker is not None:
+                # Любой ответ сервера, кроме недоступности, значит, что он жив
+                if error_kind in RETRYABLE_ERRORS:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+            if error_kind not in RETRYABLE_ERRORS or attempt >= self.max_attempts:
+                break
+
+            delay = self.get_backoff(attempt - 1, retry_after)
+            stats.retries += 1
+            stats.retry_wait += delay
+            logger.warning(f"{self.session_name} | <magenta>Sleepagotchi</magenta> server is not responding "
+                           f"on {endpoint} ({error}). Retrying in {delay:.1f}s..")
+            await asyncio.sleep(delay)
+
+        # Запрос, который предохранитель не пропустил вовсе, ошибкой эндпоинта не считается
+        if attempt:
+            stats.errors += 1
+        return ApiResult(endpoint, status=status, error=error, error_kind=error_kind, attempts=attempt,
+                         elapsed=perf_counter() - started)
@@ -0,0 +1,82 @@
+"""
+Распределение героев по слотам испытаний.
+
+Слоты всех открытых испытаний окна и свободные герои образуют двудольный
+граф (ребро — герой подходит слоту по классу, уровню и звёздам). Максимальное
+паросочетание ищется алгоритмом Куна; слоты более приоритетных испытаний
+обрабатываются первыми и уже не теряют героя при последующих перестановках.
+"""
+from bot.core.models import Challenge, Hero
+
+RESOURCE_PRIORITY = {
+    "points": 0,
+    "gacha": 2,
+}
+
+
+class HeroIndex:
+    """
+    Свободные герои, сгруппированные по классу и отсортированные по уровню и звёздам.
+    """
+
+    def __init__(self, heroes: list[Hero]):
+        self.by_class = {}
+        for hero in heroes:
+            self.by_class.setdefault(hero.hero_class, []).append(hero)
+
+        for group in self.by_class.values():
+            group.sort(key=lambda hero: (hero.level, hero.stars, hero.power), reverse=True)
+
+    def candidates(self, hero_class: str, min_level: int, min_stars: int) -> list[str]:
+        result = []
+        for hero in self.by_class.get(hero_class, []):
+            if hero.level < min_level:
+                break
+            if hero.stars >= min_stars:
+                result.append(hero.hero_type)
+        return result
+
+
+def get_open_slots(challenge: Challenge) -> list[tuple[int, str]]:
+    return [(slot.slot_id, slot.hero_class) for slot in challenge.slots if slot.is_open]
+
+
+def _augment(number: int, slots: list, hero_slot: dict, visited: set) -> bool:
+    for hero_type in slots[number][2]:
+        if hero_type in visited:
+            continue
+        visited.add(hero_type)
+
+        if hero_type not in hero_slot or _augment(hero_slot[hero_type], slots, hero_slot, visited):
+            hero_slot[hero_type] = number
+            return True
+
+    return False
+
+
+def assign_heroes(heroes: list[Hero], challenges: list[Challenge]) -> dict[str, list[dict]]:
+    """
+    Возвращает {challengeType: [{"slotId": ..., "heroType": ...}, ...]} с максимальным
+    числом заполненных слотов; каждый герой используется не более одного раза.
+    """
+    index = HeroIndex(heroes)
+
+    ordered = sorted(challenges, key=lambda challenge: RESOURCE_PRIORITY.get(challenge.resource_type, 1))
+    slots = [
+        (challenge.challenge_type, slot_id,
+         index.candidates(hero_class, challenge.min_level, challenge.min_stars))
+        for challenge in ordered
+        for slot_id, hero_class in get_open_slots(challenge)
+    ]
+
+    hero_slot = {}
+    for number in range(len(slots)):
+        if slots[number][2]:
+            _augment(number, slots, hero_slot, set())
+
+    assignments = {}
+    for hero_type, number in sorted(hero_slot.items(), key=lambda item: item[1]):
+        challenge_type, slot_id, _ = slots[number]
+        assignments.setdefault(challenge_type, []).append({"slotId": slot_id, "heroType": hero_type})
+
+    return assignments
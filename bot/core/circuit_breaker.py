@@ -0,0 +1,129 @@
+"""
+Общий для всех аккаунтов предохранитель на случай недоступности Sleepagotchi.
+
+closed — запросы идут как обычно. После CIRCUIT_FAILURE_THRESHOLD подряд
+попыток, закончившихся 429/5xx-недоступностью или сетевой ошибкой, он
+переходит в open: запросы не отправляются, аккаунты ждут в планировщике.
+Через open_timeout — half-open: пропускается не больше CIRCUIT_HALF_OPEN_PROBES
+пробных запросов. Столько же успешных проб закрывают его, любая неудачная
+открывает снова с удвоенным (до CIRCUIT_OPEN_TIMEOUT_MAX) таймаутом.
+"""
+import random
+from time import time
+
+from bot.config import settings
+from bot.utils import logger
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+_circuit_breaker = None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, open_timeout: float, open_timeout_max: float, probes: int):
+        self.failure_threshold = failure_threshold
+        self.base_open_timeout = open_timeout
+        self.open_timeout = open_timeout
+        self.open_timeout_max = open_timeout_max
+        self.probes = probes
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def reopen_at(self) -> float:
+        return self.opened_at + self.open_timeout
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == STATE_CLOSED
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Открыт и ещё не готов к пробам.
+        """
+        return self.state == STATE_OPEN and time() < self.reopen_at
+
+    def allow(self) -> bool:
+        if self.state == STATE_OPEN and time() >= self.reopen_at:
+            self.state = STATE_HALF_OPEN
+            self.probes_in_flight = self.probe_successes = 0
+            logger.info("<magenta>Sleepagotchi</magenta> circuit is <yellow>half-open</yellow>, sending probes")
+
+        if self.state == STATE_CLOSED:
+            return True
+
+        if self.state == STATE_HALF_OPEN and self.probes_in_flight < self.probes:
+            self.probes_in_flight += 1
+            return True
+
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """
+        Пропущенный запрос не дошёл до ответа (задачу отменили).
+        """
+        if self.state == STATE_HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != STATE_HALF_OPEN:
+            return
+
+        self.release()
+        self.probe_successes += 1
+        if self.probe_successes >= self.probes:
+            self.state = STATE_CLOSED
+            self.open_timeout = self.base_open_timeout
+            logger.success("<magenta>Sleepagotchi</magenta> is available again, circuit is closed")
+
+    def record_failure(self) -> None:
+        if self.state == STATE_HALF_OPEN:
+            self.release()
+            self.open(min(self.open_timeout * 2, self.open_timeout_max))
+            return
+
+        self.failures += 1
+        if self.state == STATE_CLOSED and self.failures >= self.failure_threshold:
+            self.open(self.open_timeout)
+
+    def open(self, timeout: float) -> None:
+        self.state = STATE_OPEN
+        self.opened_at = time()
+        self.open_timeout = timeout
+        self.failures = 0
+        self.opens += 1
+        logger.warning(f"<magenta>Sleepagotchi</magenta> is unavailable, circuit is <red>open</red> "
+                       f"for {timeout:.0f}s")
+
+    def parked_until(self) -> float | None:
+        """
+        До какого времени аккаунтам не стоит начинать цикл; None — предохранитель закрыт.
+        Пробуждения разбрасываются, чтобы после закрытия не ударить по серверу разом.
+        """
+        if self.state == STATE_CLOSED:
+            return None
+        return max(self.reopen_at, time()) + random.uniform(0, self.base_open_timeout)
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    global _circuit_breaker
+
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker(
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            open_timeout=settings.CIRCUIT_OPEN_TIMEOUT,
+            open_timeout_max=settings.CIRCUIT_OPEN_TIMEOUT_MAX,
+            probes=settings.CIRCUIT_HALF_OPEN_PROBES,
+        )
+
+    return _circuit_breaker
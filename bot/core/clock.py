@@ -0,0 +1,93 @@
+"""
+Часы сервера Sleepagotchi.
+
+Все сроки в ответах API (freeGachaNextClaim, nextClaimAt, unlockAt) —
+миллисекунды по часам сервера. Смещение его часов относительно локальных
+оценивается по заголовку Date: ответ сформирован где-то между отправкой
+запроса и получением ответа, а Date округлён вниз до секунды, поэтому каждый
+ответ задаёт интервал, в котором лежит смещение. Интервалы последних ответов
+пересекаются, оценка — середина пересечения.
+
+Сроки внутри бота — целые миллисекунды монотонных часов (deadline), в
+часовой пояс DISPLAY_TIMEZONE время переводится только при выводе.
+"""
+from collections import deque
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from time import monotonic_ns, time
+
+import pytz
+
+from bot.config import settings
+
+display_timezone = pytz.timezone(settings.DISPLAY_TIMEZONE)
+
+_server_clock = None
+
+
+def monotonic_ms() -> int:
+    return monotonic_ns() // 1_000_000
+
+
+def format_server_time(server_ms: int, fmt: str = '%H:%M:%S') -> str:
+    return datetime.fromtimestamp(server_ms / 1000, tz=pytz.utc).astimezone(display_timezone).strftime(fmt)
+
+
+class ServerClock:
+    def __init__(self, window: int = 32):
+        self.samples = deque(maxlen=window)
+        self.offset = 0.0
+        self.uncertainty = None
+
+    def observe(self, date: str | None, sent_at: float, received_at: float) -> None:
+        """
+        sent_at, received_at — локальное unix-время отправки запроса и получения ответа.
+        """
+        if not date:
+            return
+
+        try:
+            server_at = parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError):
+            return
+
+        sample = (server_at - received_at, server_at + 1 - sent_at)
+        self.samples.append(sample)
+        low = max(sample[0] for sample in self.samples)
+        high = min(sample[1] for sample in self.samples)
+        if low > high:
+            # Чьи-то часы перевели — старые замеры больше не согласуются с новыми
+            self.samples.clear()
+            self.samples.append(sample)
+            low, high = sample
+
+        self.offset = (low + high) / 2
+        self.uncertainty = (high - low) / 2
+
+    def server_now_ms(self) -> int:
+        return int((time() + self.offset) * 1000)
+
+    def deadline(self, server_ms: int) -> int:
+        """
+        Момент server_ms по часам сервера в миллисекундах монотонных часов.
+        """
+        return monotonic_ms() + server_ms - self.server_now_ms()
+
+    def to_local(self, server_ms: int) -> float:
+        """
+        Момент server_ms в локальном unix-времени — для планировщика и вывода.
+        """
+        return server_ms / 1000 - self.offset
+
+
+def remaining(deadline: int) -> float:
+    return (deadline - monotonic_ms()) / 1000
+
+
+def get_server_clock() -> ServerClock:
+    global _server_clock
+
+    if _server_clock is None:
+        _server_clock = ServerClock()
+
+    return _server_clock
@@ -0,0 +1,199 @@
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager, suppress
+from importlib import import_module
+from time import time
+
+from bot.config import settings
+from bot.exceptions import InvalidSession
+from bot.utils import logger
+
+_pyrogram_import: asyncio.Future | None = None
+
+
+def import_pyrogram(loop: asyncio.AbstractEventLoop):
+    # pyrogram при импорте запоминает asyncio.get_event_loop() — в потоке его нужно подставить
+    asyncio.set_event_loop(loop)
+    try:
+        return import_module("pyrogram")
+    finally:
+        asyncio.set_event_loop(None)
+
+
+def preload_pyrogram() -> asyncio.Future:
+    """
+    Импорт pyrogram (около 0.8 с) в потоке, чтобы первый логин не
+    останавливал цикл событий для всех аккаунтов.
+    """
+    global _pyrogram_import
+
+    loop = asyncio.get_running_loop()
+    if _pyrogram_import is None or _pyrogram_import.get_loop() is not loop:
+        _pyrogram_import = loop.run_in_executor(None, import_pyrogram, loop)
+
+    return _pyrogram_import
+
+
+class TelegramClientManager:
+    """
+    Владеет всеми Telegram-клиентами.
+
+    Client создаётся при первом обращении к сессии (pyrogram импортируется
+    там же, поэтому запуск с живым кэшем авторизации его не грузит), одновременно открытых
+    подключений не больше TG_MAX_CONNECTIONS, первые подключения сессий
+    разносятся по окну, растущему с числом сессий, а простаивающие клиенты
+    отключаются и забываются.
+
+    Слот подключения занимается при connect() и освобождается только после
+    disconnect(): простаивающий подключённый клиент тоже держит слот. Когда
+    свободных слотов нет, отключается клиент, дольше всех не использовавшийся.
+    """
+
+    def __init__(self, session_names: list[str]):
+        self.session_names = session_names
+        self.idle_timeout = settings.TG_IDLE_TIMEOUT
+
+        self._clients = {}
+        self._last_used = {}
+        self._in_use = Counter()
+        # Сессии, чьи клиенты держат слот подключения
+        self._connected = set()
+        self._connected_once = set()
+        self._semaphore = asyncio.Semaphore(settings.TG_MAX_CONNECTIONS)
+
+        window = min(settings.TG_STARTUP_WINDOW_MAX, len(session_names) * settings.TG_STARTUP_SPACING)
+        self._startup_spacing = window / len(session_names) if session_names else 0
+        self._next_startup_slot = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get_client(self, session_name: str):
+        client = self._clients.get(session_name)
+        if client is None:
+            from pyrogram import Client
+
+            client = Client(
+                name=session_name,
+                api_id=settings.API_ID,
+                api_hash=settings.API_HASH,
+                workdir="sessions/",
+                plugins=dict(root="bot/plugins"),
+            )
+            self._clients[session_name] = client
+
+        return client
+
+    async def _wait_for_startup_slot(self, session_name: str) -> None:
+        if session_name in self._connected_once:
+            return
+        self._connected_once.add(session_name)
+
+        now = time()
+        slot = max(now, self._next_startup_slot)
+        self._next_startup_slot = slot + self._startup_spacing
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _acquire_slot(self) -> None:
+        while self._semaphore.locked():
+            idle = [session_name for session_name in self._connected if not self._in_use[session_name]]
+            if not idle:
+                break
+            await self._disconnect_client(min(idle, key=lambda session_name: self._last_used.get(session_name, 0)))
+
+        await self._semaphore.acquire()
+
+    async def _disconnect_client(self, session_name: str) -> None:
+        # Клиент забывается до await: connection() во время отключения создаст новый
+        client = self._clients.pop(session_name, None)
+        holds_slot = session_name in self._connected
+        self._connected.discard(session_name)
+
+        try:
+            if client is not None and client.is_connected:
+                with suppress(Exception):
+                    await client.disconnect()
+        finally:
+            if holds_slot:
+                self._semaphore.release()
+
+    @asynccontextmanager
+    async def connection(self, session_name: str, stagger: bool = True):
+        """
+        stagger=False — без разнесения первого подключения (проверка сессий
+        перед запуском сама ограничивает число одновременных подключений).
+        """
+        await preload_pyrogram()
+        from pyrogram.errors import Unauthorized, UserDeactivated, AuthKeyUnregistered
+
+        client = self.get_client(session_name)
+        self._in_use[session_name] += 1
+
+        try:
+            if stagger and not client.is_connected:
+                await self._wait_for_startup_slot(session_name)
+
+            if session_name not in self._connected:
+                await self._acquire_slot()
+                if session_name in self._connected:
+                    # Пока ждали слот, клиент подключил параллельный вызов
+                    self._semaphore.release()
+                else:
+                    self._connected.add(session_name)
+
+            if not client.is_connected:
+                try:
+                    await client.connect()
+                except (Unauthorized, UserDeactivated, AuthKeyUnregistered) as error:
+                    self._release_unconnected(session_name, client)
+                    raise InvalidSession(session_name) from error
+                except BaseException:
+                    self._release_unconnected(session_name, client)
+                    raise
+
+            yield client
+        finally:
+            self._in_use[session_name] -= 1
+            self._last_used[session_name] = time()
+
+    def _release_unconnected(self, session_name: str, client) -> None:
+        """
+        Подключиться не удалось — слот отдаётся, клиент остаётся в словаре.
+        """
+        if self._clients.get(session_name) is client and session_name in self._connected and not client.is_connected:
+            self._connected.discard(session_name)
+            self._semaphore.release()
+
+    async def disconnect(self, session_name: str) -> None:
+        """
+        Отключает и забывает клиент сессии, если им никто не пользуется.
+        """
+        if session_name in self._clients and not self._in_use[session_name]:
+            await self._disconnect_client(session_name)
+
+    async def disconnect_idle(self) -> int:
+        deadline = time() - self.idle_timeout
+        disconnected = 0
+
+        for session_name in list(self._clients):
+            # Проверка на каждом шаге: пока отключался предыдущий клиент, этот могли взять
+            if self._in_use[session_name] or self._last_used.get(session_name, 0) > deadline:
+                continue
+
+            disconnected += session_name in self._connected
+            await self._disconnect_client(session_name)
+
+        return disconnected
+
+    async def run_idle_reaper(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 2, 1))
+            disconnected = await self.disconnect_idle()
+            if disconnected:
+                logger.info(f"Disconnected <ly>{disconnected}</ly> idle Telegram clients")
+
+    async def close(self) -> None:
+        for session_name in list(self._clients):
+            await self._disconnect_client(session_name)
@@ -0,0 +1,98 @@
+from bot.core.clock import get_server_clock
+from bot.core.models import Constellation, Hero
+
+
+class ConstellationCache:
+    """
+    Кэш окна созвездий одного аккаунта.
+
+    Окно живёт, пока не наступит ближайшая разблокировка испытания или
+    героя (после неё меняется прогресс испытаний) либо не истечёт ttl.
+    Успешные отправки героев применяются к кэшу локально.
+    """
+
+    def __init__(self, ttl: int = 600):
+        self.ttl = ttl
+        self.constellations = {}
+        self.start_index = 0
+        self.end_index = 0
+        self.last_index = None
+        self.expires_at = 0
+
+    def invalidate(self) -> None:
+        self.constellations = {}
+        self.start_index = self.end_index = 0
+        self.last_index = None
+        self.expires_at = 0
+
+    def covers(self, start_index: int, end_index: int, last_index: int, now_ms: int | None = None) -> bool:
+        if now_ms is None:
+            now_ms = get_server_clock().server_now_ms()
+
+        return (
+                self.last_index == last_index and
+                now_ms < self.expires_at and
+                self.start_index <= start_index and
+                end_index <= self.end_index
+        )
+
+    def store(self, constellations: list[Constellation], start_index: int, end_index: int, last_index: int,
+              now_ms: int | None = None) -> None:
+        if now_ms is None:
+            now_ms = get_server_clock().server_now_ms()
+
+        self.constellations = {constellation.index: constellation for constellation in constellations}
+        self.start_index = start_index
+        self.end_index = end_index
+        self.last_index = last_index
+        self.expires_at = now_ms + self.ttl * 1000
+
+        next_unlock = self.next_unlock_at(now_ms)
+        if next_unlock is not None:
+            self.expire_at(next_unlock)
+
+    def expire_at(self, timestamp_ms: int) -> None:
+        if timestamp_ms < self.expires_at:
+            self.expires_at = timestamp_ms
+
+    def get(self, index: int) -> Constellation | None:
+        return self.constellations.get(index)
+
+    def window(self, start_index: int, end_index: int) -> list[Constellation]:
+        return [self.constellations[index] for index in sorted(self.constellations)
+                if start_index <= index < end_index]
+
+    def next_unlock_at(self, now_ms: int | None = None) -> int | None:
+        if now_ms is None:
+            now_ms = get_server_clock().server_now_ms()
+
+        unlocks = [challenge.unlock_at
+                   for constellation in self.constellations.values()
+                   for challenge in constellation.challenges
+                   if challenge.unlock_at > now_ms]
+
+        return min(unlocks) if unlocks else None
+
+    def apply_send(self, challenge_type: str, heroes: list[dict], constellations: list[Constellation],
+                   sent_heroes: list[Hero]) -> None:
+        """
+        Применяет ответ sendToChallenge: занимает слоты и сокращает срок жизни
+        кэша до возвращения отправленных героев.
+        """
+        for constellation in constellations:
+            if constellation.index in self.constellations:
+                self.constellations[constellation.index] = constellation
+
+        slot_heroes = {hero["slotId"]: hero["heroType"] for hero in heroes}
+        for constellation in self.constellations.values():
+            for challenge in constellation.challenges:
+                if challenge.challenge_type != challenge_type:
+                    continue
+                for slot in challenge.slots:
+                    if slot.slot_id in slot_heroes:
+                        slot.occupied_by = slot_heroes[slot.slot_id]
+
+        sent_types = set(slot_heroes.values())
+        for hero in sent_heroes:
+            if hero.hero_type in sent_types and hero.unlock_at > 0:
+                self.expire_at(hero.unlock_at)
@@ -0,0 +1,63 @@
+import asyncio
+from importlib import import_module
+
+import aiohttp
+
+from bot.config import settings
+from .headers import headers
+
+_http_client: aiohttp.ClientSession | None = None
+_scraper_import: asyncio.Future | None = None
+
+
+def preload_http_client() -> asyncio.Future:
+    """
+    Запускает импорт aiocfscrape в потоке: он тянет js2py (около 0.75 с), и
+    синхронный импорт при первом запросе останавливал бы цикл событий для
+    всех аккаунтов. Вызывается при запуске, пока идут логины сессий.
+    """
+    global _scraper_import
+
+    if _scraper_import is None or _scraper_import.get_loop() is not asyncio.get_running_loop():
+        _scraper_import = asyncio.get_running_loop().run_in_executor(None, import_module, "aiocfscrape")
+
+    return _scraper_import
+
+
+async def get_http_client() -> aiohttp.ClientSession:
+    """
+    Общий для всех аккаунтов HTTP-клиент с ограниченным пулом соединений.
+
+    Авторизация аккаунта (query) передаётся в каждом запросе, поэтому сессия
+    не хранит состояние конкретного аккаунта и переиспользует keep-alive
+    соединения, DNS-кэш и TLS-сессии к tgapi.sleepagotchi.com.
+    """
+    global _http_client
+
+    if _http_client is None or _http_client.closed:
+        # Ждём импорт из потока, а не импортируем здесь: иначе цикл встал бы на блокировке импорта
+        aiocfscrape = await preload_http_client()
+
+        if _http_client is None or _http_client.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_POOL_SIZE,
+                limit_per_host=settings.HTTP_POOL_SIZE,
+                ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            )
+            _http_client = aiocfscrape.CloudflareScraper(
+                headers=headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=settings.HTTP_TIMEOUT),
+            )
+
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+
+    if _http_client is not None and not _http_client.closed:
+        await _http_client.close()
+
+    _http_client = None
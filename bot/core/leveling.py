@@ -0,0 +1,164 @@
+"""
+Планировщик повышения уровней героев под требования испытаний.
+
+Сервер отдаёт стоимость только следующего уровня, а она растёт с каждым
+уровнем. Прирост за уровень (отдельно для каждой редкости) оценивается по
+героям игрока — у героев одной редкости на разных уровнях разная стоимость —
+и уточняется по costLevelGold/costLevelGreen из каждого ответа levelUpHero.
+Пока прирост неизвестен, стоимость плана — нижняя оценка N * costLevel.
+"""
+from statistics import median
+
+from bot.core.models import Hero
+
+_level_cost_model = None
+
+
+class LevelCostModel:
+    """
+    Прирост стоимости уровня по редкости героя, общий для всех аккаунтов:
+    правила игры у всех одинаковые.
+    """
+
+    def __init__(self):
+        # rarity -> (прирост золота, прирост зелёных камней) за уровень
+        self.observed: dict[int, tuple[float, float]] = {}
+        self.fitted: dict[int, tuple[float, float]] = {}
+
+    def observe(self, hero: Hero, gold_before: int, green_before: int) -> None:
+        """
+        hero — уже обновлённый по ответу levelUpHero.
+        """
+        self.observed[hero.rarity] = (hero.cost_level_gold - gold_before, hero.cost_level_green - green_before)
+
+    def fit(self, heroes: list[Hero]) -> None:
+        by_rarity = {}
+        for hero in heroes:
+            if hero.level and hero.cost_level_gold:
+                by_rarity.setdefault(hero.rarity, {})[hero.level] = hero
+
+        for rarity, by_level in by_rarity.items():
+            levels = sorted(by_level)
+            if len(levels) < 2:
+                continue
+            pairs = [(by_level[low], by_level[high]) for low, high in zip(levels, levels[1:])]
+            self.fitted[rarity] = (
+                median((high.cost_level_gold - low.cost_level_gold) / (high.level - low.level) for low, high in pairs),
+                median((high.cost_level_green - low.cost_level_green) / (high.level - low.level) for low, high in pairs),
+            )
+
+    def get_step(self, hero: Hero) -> tuple[float, float] | None:
+        step = self.observed.get(hero.rarity) or self.fitted.get(hero.rarity)
+        # Отрицательный прирост — шум оценки, стоимость уровня не падает
+        return step and (max(step[0], 0), max(step[1], 0))
+
+    def cost(self, hero: Hero, levels: int) -> tuple[int, int, bool]:
+        """
+        (золото, зелёные камни, оценка точная) за levels уровней от текущего.
+        """
+        step = self.get_step(hero)
+        gold_step, green_step = step or (0, 0)
+        growth = levels * (levels - 1) / 2
+        return (round(levels * hero.cost_level_gold + gold_step * growth),
+                round(levels * hero.cost_level_green + green_step * growth),
+                step is not None)
+
+    def affordable_levels(self, hero: Hero, levels: int, gold: int, green: int) -> int:
+        affordable = 0
+        while affordable < levels:
+            next_gold, next_green, _ = self.cost(hero, affordable + 1)
+            if next_gold > gold or next_green > green:
+                break
+            affordable += 1
+        return affordable
+
+
+def get_level_cost_model() -> LevelCostModel:
+    global _level_cost_model
+
+    if _level_cost_model is None:
+        _level_cost_model = LevelCostModel()
+
+    return _level_cost_model
+
+
+class LevelUpPlan:
+    """
+    exact=False — прирост стоимости для редкости героя ещё не известен,
+    gold и green — нижняя оценка.
+    """
+    __slots__ = ("hero_type", "from_level", "target_level", "gold", "green", "exact")
+
+    def __init__(self, hero_type: str, from_level: int, target_level: int, gold: int, green: int,
+                 exact: bool = True):
+        self.hero_type = hero_type
+        self.from_level = from_level
+        self.target_level = target_level
+        self.gold = gold
+        self.green = green
+        self.exact = exact
+
+    @property
+    def levels(self) -> int:
+        return self.target_level - self.from_level
+
+    def __repr__(self) -> str:
+        bound = "" if self.exact else ">="
+        return f"LevelUpPlan({self.hero_type}: {self.from_level} -> {self.target_level}, gold={bound}{self.gold})"
+
+
+def is_level_up_candidate(hero: Hero, min_stars: int, min_level: int) -> bool:
+    """
+    Герой стоит прокачки: обычный (rarity 0) со звёздами выше требования или
+    почти нужного уровня, либо редкий с достаточными звёздами.
+    """
+    if hero.unlock_at != 0 or hero.level >= min_level:
+        return False
+
+    if hero.rarity == 0:
+        return hero.stars >= min_stars + 1 or (hero.stars >= min_stars and hero.level >= min_level - 1)
+
+    return hero.rarity in [1, 2, 3] and hero.stars >= min_stars
+
+
+def plan_level_ups(heroes: list[Hero], gold: int, green: int, min_level: int, min_stars: int,
+                   costs: LevelCostModel | None = None) -> list[LevelUpPlan]:
+    """
+    Целевые уровни для всех героев за один проход: сначала самые дешёвые
+    полные прокачки до min_level, на остаток бюджета — частичная прокачка.
+    Герои, для которых известна только нижняя оценка, идут после точно
+    оценённых — по числу уровней, а не по заниженной сумме.
+    """
+    if costs is None:
+        costs = get_level_cost_model()
+    costs.fit(heroes)
+
+    candidates = []
+    for hero in heroes:
+        if not is_level_up_candidate(hero, min_stars, min_level):
+            continue
+
+        levels = min_level - hero.level
+        plan_gold, plan_green, exact = costs.cost(hero, levels)
+        candidates.append((hero, LevelUpPlan(hero.hero_type, hero.level, min_level, plan_gold, plan_green, exact)))
+
+    candidates.sort(key=lambda item: (0, item[1].gold, item[1].green) if item[1].exact
+                    else (1, item[1].levels, item[1].gold))
+
+    plans = []
+    for hero, plan in candidates:
+        if plan.gold <= gold and plan.green <= green:
+            gold -= plan.gold
+            green -= plan.green
+            plans.append(plan)
+            continue
+
+        # Частичная прокачка самого дешёвого из недоступных героев
+        affordable = costs.affordable_levels(hero, plan.levels, gold, green)
+        if affordable > 0:
+            plan_gold, plan_green, exact = costs.cost(hero, affordable)
+            plans.append(LevelUpPlan(plan.hero_type, plan.from_level, plan.from_level + affordable,
+                                     plan_gold, plan_green, exact))
+        break
+
+    return plans
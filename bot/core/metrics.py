@@ -0,0 +1,158 @@
+"""
+Метрики в текстовом формате Prometheus.
+
+Счётчики запросов и гистограммы задержек берутся из endpoint_stats, здесь
+живут только длительности фаз цикла, прочие счётчики и датчики. Сервер
+работает в том же цикле событий и считает ответ только по запросу /metrics.
+"""
+from bisect import bisect_left
+from collections import Counter
+
+from aiohttp import web
+
+from bot.core.api import LATENCY_BUCKETS, endpoint_stats
+from bot.utils import logger
+
+PREFIX = "sleepagotchi"
+PHASE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_metrics_runner: web.AppRunner | None = None
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+phase_durations: dict[str, Histogram] = {}
+counters = Counter()
+gauges = {}
+gauge_values = {}
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    histogram = phase_durations.get(phase)
+    if histogram is None:
+        histogram = phase_durations[phase] = Histogram(PHASE_BUCKETS)
+    histogram.observe(seconds)
+
+
+def inc(name: str, value: int = 1) -> None:
+    counters[name] += value
+
+
+def register_gauge(name: str, func) -> None:
+    gauges[name] = func
+
+
+def collect_gauges() -> dict[str, float]:
+    values = dict(gauge_values)
+    for name, func in gauges.items():
+        values[name] = func()
+    return values
+
+
+def dump_metrics() -> dict:
+    return {
+        "phases": {phase: [histogram.counts, histogram.total] for phase, histogram in phase_durations.items()},
+        "counters": dict(counters),
+        "gauges": collect_gauges(),
+    }
+
+
+def merge_metrics(snapshots: list[dict]) -> None:
+    """
+    Пересобирает метрики супервизора из снимков воркеров.
+    """
+    phase_durations.clear()
+    counters.clear()
+    gauge_values.clear()
+
+    for snapshot in snapshots:
+        for phase, (counts, total) in snapshot["phases"].items():
+            histogram = phase_durations.get(phase)
+            if histogram is None:
+                histogram = phase_durations[phase] = Histogram(PHASE_BUCKETS)
+            histogram.counts = [current + count for current, count in zip(histogram.counts, counts)]
+            histogram.total += total
+        counters.update(snapshot["counters"])
+        for name, value in snapshot["gauges"].items():
+            gauge_values[name] = gauge_values.get(name, 0) + value
+
+
+def format_labels(labels: dict) -> str:
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def render_histogram(lines: list[str], name: str, labels: dict, buckets: tuple, counts: list[int],
+                     total: float) -> None:
+    cumulative = 0
+    for bound, count in zip((*buckets, "+Inf"), counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {cumulative}")
+    lines.append(f"{name}_sum{format_labels(labels)} {total}")
+    lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+
+
+def render_metrics() -> str:
+    lines = []
+
+    for metric, field in (("requests_total", "requests"), ("errors_total", "errors"),
+                          ("retries_total", "retries"), ("retry_wait_seconds_total", "retry_wait")):
+        lines.append(f"# TYPE {PREFIX}_{metric} counter")
+        for endpoint, stats in endpoint_stats.items():
+            lines.append(f'{PREFIX}_{metric}{{endpoint="{endpoint}"}} {getattr(stats, field)}')
+
+    lines.append(f"# TYPE {PREFIX}_request_latency_seconds histogram")
+    for endpoint, stats in endpoint_stats.items():
+        render_histogram(lines, f"{PREFIX}_request_latency_seconds", {"endpoint": endpoint},
+                         LATENCY_BUCKETS, stats.latency_counts, stats.latency_total)
+
+    lines.append(f"# TYPE {PREFIX}_phase_duration_seconds histogram")
+    for phase, histogram in phase_durations.items():
+        render_histogram(lines, f"{PREFIX}_phase_duration_seconds", {"phase": phase},
+                         histogram.buckets, histogram.counts, histogram.total)
+
+    for name, value in counters.items():
+        lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+        lines.append(f"{PREFIX}_{name}_total {value}")
+
+    for name, value in collect_gauges().items():
+        lines.append(f"# TYPE {PREFIX}_{name} gauge")
+        lines.append(f"{PREFIX}_{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render_metrics(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def start_metrics_server(host: str, port: int) -> None:
+    global _metrics_runner
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+
+    _metrics_runner = web.AppRunner(app, access_log=None)
+    await _metrics_runner.setup()
+    await web.TCPSite(_metrics_runner, host, port).start()
+
+    logger.info(f"Metrics are served on <ly>http://{host}:{port}/metrics</ly>")
+
+
+async def close_metrics_server() -> None:
+    global _metrics_runner
+
+    if _metrics_runner is not None:
+        await _metrics_runner.cleanup()
+
+    _metrics_runner = None
@@ -0,0 +1,118 @@
+"""
+Локальное зеркало состояния игрока.
+
+Ответы мутаций (spendGacha, claimDailyRewards, starUpHero, levelUpHero,
+sendToChallenge, sendToClanChallenge) применяются к зеркалу как дельты, и
+логика решений читает только его. С сервером зеркало полностью сверяется
+по таймеру (синхронизация аккаунта) или когда помечено устаревшим: сервер
+отклонил мутацию, которую зеркало считало допустимой, либо ответ не
+содержит нужного поля.
+"""
+from bot.core.models import Hero, Player, Resources
+
+
+class PlayerMirror:
+    def __init__(self):
+        self.player: Player | None = None
+        self.stale = True
+        # Интервал бесплатной гачи (мс) узнаётся по первому получению
+        self.gacha_cooldown = None
+
+    @property
+    def ready(self) -> bool:
+        return self.player is not None and not self.stale
+
+    def mark_stale(self) -> None:
+        self.stale = True
+
+    def replace(self, data: dict) -> list[str]:
+        """
+        Полное состояние игрока с сервера. Возвращает расхождения с зеркалом,
+        если оно считалось актуальным.
+        """
+        player = Player.from_dict(data)
+        mismatches = self.diff(player) if self.ready else []
+        self.player = player
+        self.stale = False
+        return mismatches
+
+    def diff(self, player: Player) -> list[str]:
+        """
+        Сравнивает только то, что зеркало меняет само: золото, зелёные камни,
+        гачу, карточки, уровни и звёзды героев.
+        """
+        mismatches = []
+        for key in ("gold", "greenStones", "gacha"):
+            local, remote = self.player.resources.amount(key), player.resources.amount(key)
+            if local != remote:
+                mismatches.append(f"{key}: {local} != {remote}")
+
+        heroes = {hero.hero_type: hero for hero in self.player.heroes}
+        for hero in player.heroes:
+            local = heroes.get(hero.hero_type)
+            if local is None:
+                mismatches.append(f"{hero.hero_type}: missing")
+            elif (local.level, local.stars) != (hero.level, hero.stars):
+                mismatches.append(f"{hero.hero_type}: {local.level}/{local.stars} != {hero.level}/{hero.stars}")
+            elif self.player.resources.hero_cards.get(hero.hero_type) != player.resources.hero_cards.get(hero.hero_type):
+                mismatches.append(f"{hero.hero_type} cards")
+        return mismatches
+
+    def get_hero(self, hero_type: str) -> Hero | None:
+        return next((hero for hero in self.player.heroes if hero.hero_type == hero_type), None)
+
+    def apply_player(self, data: dict) -> None:
+        """
+        Ответ мутации с полным игроком (sendToChallenge, claimChallengesRewards).
+        """
+        if 'player' in data:
+            self.player = Player.from_dict(data['player'])
+            self.stale = False
+
+    def add_resource(self, key: str, amount: int) -> None:
+        field = Resources.FIELDS.get(key)
+        if field is not None:
+            setattr(self.player.resources, field, self.player.resources.amount(key) + amount)
+
+    def apply_level_up(self, hero: Hero, data: dict) -> None:
+        self.add_resource("gold", -data.get('spentGold', hero.cost_level_gold))
+        self.add_resource("greenStones", -hero.cost_level_green)
+        hero.update(data.get('hero', {}))
+
+    def apply_star_up(self, hero_type: str, data: dict) -> None:
+        hero = self.get_hero(hero_type)
+        if hero is None or 'hero' not in data:
+            self.stale = True
+            return
+
+        cards = self.player.resources.hero_cards
+        cards[hero_type] = cards.get(hero_type, 0) - hero.cost_star
+        hero.update(data['hero'])
+
+    def apply_gacha(self, amount: int, strategy: str, data: dict, now_ms: int) -> None:
+        if strategy == "free":
+            if self.gacha_cooldown is None:
+                # Срок следующей бесплатной гачи в ответе не приходит
+                self.stale = True
+            else:
+                self.player.free_gacha_next_claim = now_ms + self.gacha_cooldown
+        else:
+            self.add_resource("gacha", -amount)
+
+        cards = self.player.resources.hero_cards
+        for card in data.get('heroCard', []):
+            cards[card['heroType']] = cards.get(card['heroType'], 0) + card['amount']
+
+    def apply_daily_reward(self, data: dict) -> None:
+        self.player.daily_reward_available = False
+        rewards = data.get('rewards')
+        if rewards:
+            self.add_resource(rewards['rewardType'], rewards['rewardAmount'])
+
+    def release_heroes(self, now_ms: int) -> None:
+        """
+        Герои, чей срок на испытании прошёл, свободны — сервер сбрасывает им unlockAt.
+        """
+        for hero in self.player.heroes:
+            if hero.unlock_at and hero.unlock_at <= now_ms:
+                hero.unlock_at = 0
@@ -0,0 +1,181 @@
+"""
+Компактные модели ответов API.
+
+Ответ разбирается один раз: из словаря берутся только поля, которые нужны
+циклу, остальное (описания, картинки, локализация) сразу отбрасывается.
+Слоты завершённых испытаний не разбираются вовсе — героев туда уже не
+отправить. JSON читается orjson, если он установлен.
+"""
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+class Slot:
+    __slots__ = ("slot_id", "hero_class", "unlocked", "occupied_by")
+
+    def __init__(self, slot_id: int, hero_class: str, unlocked: bool, occupied_by: str):
+        self.slot_id = slot_id
+        self.hero_class = hero_class
+        self.unlocked = unlocked
+        self.occupied_by = occupied_by
+
+    @property
+    def is_open(self) -> bool:
+        return self.unlocked and self.occupied_by == "empty"
+
+
+class Challenge:
+    __slots__ = ("challenge_type", "name", "resource_type", "min_level", "min_stars", "received", "value",
+                 "unlock_at", "slots")
+
+    def __init__(self, challenge_type: str, name: str, resource_type: str | None, min_level: int, min_stars: int,
+                 received: int, value: int, unlock_at: int, slots: list[Slot]):
+        self.challenge_type = challenge_type
+        self.name = name
+        self.resource_type = resource_type
+        self.min_level = min_level
+        self.min_stars = min_stars
+        self.received = received
+        self.value = value
+        self.unlock_at = unlock_at
+        self.slots = slots
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Challenge":
+        received, value = data["received"], data["value"]
+        slots = [] if received >= value else [
+            Slot(slot.get("slotId", position), slot["heroClass"], slot["unlocked"], slot["occupiedBy"])
+            for position, slot in enumerate(data.get("orderedSlots", ()))]
+        return cls(data["challengeType"], data.get("name"), data.get("resourceType"), data.get("minLevel", 0),
+                   data.get("minStars", 0), received, value, data["unlockAt"], slots)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.received >= self.value
+
+
+class Constellation:
+    __slots__ = ("index", "name", "challenges")
+
+    def __init__(self, index: int | None, name: str | None, challenges: list[Challenge]):
+        self.index = index
+        self.name = name
+        self.challenges = challenges
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Constellation":
+        challenge_from_dict = Challenge.from_dict
+        return cls(data.get("index"), data.get("name"),
+                   [challenge_from_dict(challenge) for challenge in data.get("challenges", ())])
+
+    @classmethod
+    def from_list(cls, data: list[dict]) -> list["Constellation"]:
+        from_dict = cls.from_dict
+        return [from_dict(constellation) for constellation in data]
+
+
+class Hero:
+    __slots__ = ("hero_type", "name", "hero_class", "rarity", "level", "stars", "power", "unlock_at", "cost_star",
+                 "cost_level_gold", "cost_level_green")
+
+    def __init__(self, hero_type: str, name: str | None = None, hero_class: str | None = None, rarity: int = 0,
+                 level: int = 0, stars: int = 0, power: int = 0, unlock_at: int = 0, cost_star: int = 0,
+                 cost_level_gold: int = 0, cost_level_green: int = 0):
+        self.hero_type = hero_type
+        self.name = name
+        self.hero_class = hero_class
+        self.rarity = rarity
+        self.level = level
+        self.stars = stars
+        self.power = power
+        self.unlock_at = unlock_at
+        self.cost_star = cost_star
+        self.cost_level_gold = cost_level_gold
+        self.cost_level_green = cost_level_green
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Hero":
+        get = data.get
+        return cls(data["heroType"], get("name"), get("class"), get("rarity", 0), get("level", 0), get("stars", 0),
+                   get("power", 0), get("unlockAt", 0), get("costStar", 0), get("costLevelGold", 0),
+                   get("costLevelGreen", 0))
+
+    def update(self, data: dict) -> None:
+        """
+        Применяет (возможно неполный) словарь героя из ответа levelUpHero и т.п.
+        """
+        self.name = data.get("name", self.name)
+        self.hero_class = data.get("class", self.hero_class)
+        self.rarity = data.get("rarity", self.rarity)
+        self.level = data.get("level", self.level)
+        self.stars = data.get("stars", self.stars)
+        self.power = data.get("power", self.power)
+        self.unlock_at = data.get("unlockAt", self.unlock_at)
+        self.cost_star = data.get("costStar", self.cost_star)
+        self.cost_level_gold = data.get("costLevelGold", self.cost_level_gold)
+        self.cost_level_green = data.get("costLevelGreen", self.cost_level_green)
+
+
+class Resources:
+    __slots__ = ("gold", "gem", "green_stones", "purple_stones", "orb", "points", "gacha", "hero_cards")
+
+    FIELDS = {
+        "gold": "gold",
+        "gem": "gem",
+        "greenStones": "green_stones",
+        "purpleStones": "purple_stones",
+        "orb": "orb",
+        "points": "points",
+        "gacha": "gacha",
+    }
+
+    def __init__(self):
+        for field in self.FIELDS.values():
+            setattr(self, field, None)
+        self.hero_cards = {}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Resources":
+        resources = cls()
+        for key, field in cls.FIELDS.items():
+            if key in data:
+                setattr(resources, field, data[key].get("amount", 0))
+        resources.hero_cards = {card["heroType"]: card["amount"] for card in data.get("heroCard", [])}
+        return resources
+
+    def amount(self, key: str) -> int:
+        return getattr(self, self.FIELDS[key]) or 0
+
+    def items(self) -> list[tuple[str, int]]:
+        """
+        (ключ API, количество) для ресурсов, которые есть в ответе.
+        """
+        return [(key, getattr(self, field)) for key, field in self.FIELDS.items() if getattr(self, field) is not None]
+
+
+class Player:
+    __slots__ = ("constellations_last_index", "free_gacha_next_claim", "daily_reward_available", "clan_id",
+                 "resources", "heroes")
+
+    def __init__(self, constellations_last_index: int, free_gacha_next_claim: int, daily_reward_available: bool,
+                 clan_id: str | None, resources: Resources, heroes: list[Hero]):
+        self.constellations_last_index = constellations_last_index
+        self.free_gacha_next_claim = free_gacha_next_claim
+        self.daily_reward_available = daily_reward_available
+        self.clan_id = clan_id
+        self.resources = resources
+        self.heroes = heroes
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Player":
+        meta = data.get("meta", {})
+        return cls(
+            constellations_last_index=meta.get("constellationsLastIndex", 0),
+            free_gacha_next_claim=meta.get("freeGachaNextClaim", 0),
+            daily_reward_available=meta.get("isNextDailyRewardAvailable", False),
+            clan_id=data.get("clanInfo", {}).get("clanId"),
+            resources=Resources.from_dict(data.get("resources", {})),
+            heroes=[Hero.from_dict(hero) for hero in data.get("heroes", [])],
+        )
@@ -0,0 +1,114 @@
+"""
+Проверка сессий перед запуском.
+
+Сессии проверяются параллельно (не больше SESSION_CHECK_CONCURRENCY
+одновременно) запросом get_me. Вердикт сохраняется в хранилище состояния
+вместе со временем проверки: рабочая сессия повторно не проверяется
+SESSION_CHECK_TTL секунд, нерабочая (bad — аккаунт удалён или заблокирован,
+expired — авторизация отозвана или истекла) в планировщик не попадает, пока
+её не пересоздадут. Сессии, которые не удалось проверить (сеть, флуд-контроль),
+запускаются как обычно и проверяются снова при следующем старте.
+"""
+import asyncio
+from collections import Counter
+from time import perf_counter, time
+
+from bot.config import settings
+from bot.core.connections import TelegramClientManager, preload_pyrogram
+from bot.core.state_store import StateStore, get_state_store
+from bot.exceptions import InvalidSession
+from bot.utils import logger
+
+VERDICT_GOOD = "good"
+VERDICT_BAD = "bad"
+VERDICT_EXPIRED = "expired"
+VERDICT_UNKNOWN = "unknown"
+
+
+def get_invalid_verdict(error: BaseException) -> str:
+    from pyrogram.errors import UserDeactivated, UserDeactivatedBan
+
+    if isinstance(error, InvalidSession):
+        error = error.__cause__
+    return VERDICT_BAD if isinstance(error, (UserDeactivated, UserDeactivatedBan)) else VERDICT_EXPIRED
+
+
+def get_cached_verdict(state: StateStore, session_name: str) -> str | None:
+    cached = state.get(session_name, "session_check")
+    if not cached:
+        return None
+    if cached["verdict"] == VERDICT_GOOD and time() - cached["checked_at"] > settings.SESSION_CHECK_TTL:
+        return None
+    return cached["verdict"]
+
+
+def save_session_verdict(state: StateStore, session_name: str, verdict: str | None) -> None:
+    """
+    None сбрасывает вердикт — например, после пересоздания сессии.
+    """
+    if verdict == VERDICT_UNKNOWN:
+        return
+    state.set(session_name, "session_check", verdict and {"verdict": verdict, "checked_at": time()})
+
+
+async def check_session(tg_clients: TelegramClientManager, session_name: str) -> str:
+    """
+    Клиент отключается сразу после проверки: одновременно открыто не больше
+    SESSION_CHECK_CONCURRENCY подключений, аккаунты потом подключаются по
+    обычному расписанию.
+    """
+    await preload_pyrogram()
+    from pyrogram.errors import Unauthorized
+
+    try:
+        async with tg_clients.connection(session_name, stagger=False) as tg_client:
+            await tg_client.get_me()
+    except (InvalidSession, Unauthorized) as error:
+        return get_invalid_verdict(error)
+    except Exception as error:
+        logger.warning(f"{session_name} | Unable to check session: <light-yellow>{error}</light-yellow>")
+        return VERDICT_UNKNOWN
+    finally:
+        await tg_clients.disconnect(session_name)
+
+    return VERDICT_GOOD
+
+
+async def check_sessions(tg_clients: TelegramClientManager) -> list[str]:
+    """
+    Возвращает сессии, которые можно ставить в планировщик.
+    """
+    started = perf_counter()
+    state = get_state_store()
+    verdicts = {}
+
+    for session_name in tg_clients.session_names:
+        verdict = get_cached_verdict(state, session_name)
+        if verdict is not None:
+            verdicts[session_name] = verdict
+    cached = len(verdicts)
+
+    semaphore = asyncio.Semaphore(settings.SESSION_CHECK_CONCURRENCY)
+
+    async def check(session_name: str) -> None:
+        async with semaphore:
+            verdict = await check_session(tg_clients, session_name)
+        save_session_verdict(state, session_name, verdict)
+        verdicts[session_name] = verdict
+
+    await asyncio.gather(*(check(session_name) for session_name in tg_clients.session_names
+                           if session_name not in verdicts))
+    state.flush()
+
+    counts = Counter(verdicts.values())
+    logger.info(f"Checked sessions in {(perf_counter() - started) * 1000:.0f} ms: "
+                f"<green>{counts[VERDICT_GOOD]}</green> good, <red>{counts[VERDICT_BAD]}</red> bad, "
+                f"<yellow>{counts[VERDICT_EXPIRED]}</yellow> expired, {counts[VERDICT_UNKNOWN]} unchecked "
+                f"(<ly>{cached}</ly> from cache)")
+
+    for session_name in tg_clients.session_names:
+        if verdicts[session_name] in (VERDICT_BAD, VERDICT_EXPIRED):
+            logger.warning(f"{session_name} | Session is <red>{verdicts[session_name]}</red>, skipping")
+
+    return [session_name for session_name in tg_clients.session_names
+            if verdicts[session_name] in (VERDICT_GOOD, VERDICT_UNKNOWN)]
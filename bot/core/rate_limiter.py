@@ -0,0 +1,160 @@
+"""
+Общий для всех аккаунтов ограничитель частоты запросов.
+
+У каждого эндпоинта свой token bucket, поверх них — общий на весь процесс.
+Пока сервер справляется, ограничения нет: бакет только считает спрос (запросов
+в секунду). Первый сигнал перегрузки (429/502/503/504) ограничивает скорость
+спросом, умноженным на RATE_LIMIT_DECREASE; дальше AIMD — после каждого
+успешного ответа скорость растёт на RATE_LIMIT_INCREASE, после перегрузки
+снова умножается на RATE_LIMIT_DECREASE (не чаще раза в RATE_LIMIT_COOLDOWN
+секунд, чтобы пачка ошибок от одной волны не обнуляла скорость). Когда
+скорость заметно обгоняет спрос, ограничение снимается.
+"""
+import asyncio
+from time import monotonic
+
+from bot.config import settings
+
+_rate_limiter = None
+
+# Окно, за которое усредняется спрос, секунд
+DEMAND_WINDOW = 1.0
+# Скорость ниже не опускается, даже если RATE_LIMIT_MIN_RPS = 0
+RATE_FLOOR = 0.1
+
+
+class TokenBucket:
+    """
+    rate=None — без ограничения. max_rate=None — без верхней границы.
+    """
+    __slots__ = ("rate", "min_rate", "max_rate", "capacity", "tokens", "updated_at", "decreased_at",
+                 "demand", "window_started", "window_count")
+
+    def __init__(self, rate: float | None, capacity: float, min_rate: float = 0.0, max_rate: float | None = None):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = monotonic()
+        self.decreased_at = 0.0
+        self.demand = 0.0
+        self.window_started = self.updated_at
+        self.window_count = 0
+
+    def count_demand(self, now: float) -> None:
+        self.window_count += 1
+        elapsed = now - self.window_started
+        if elapsed >= DEMAND_WINDOW:
+            self.demand = (self.demand + self.window_count / elapsed) / 2 if self.demand else self.window_count / elapsed
+            self.window_started = now
+            self.window_count = 0
+
+    def current_demand(self) -> float:
+        elapsed = monotonic() - self.window_started
+        return max(self.demand, self.window_count / elapsed if elapsed > 0.1 else 0.0)
+
+    def reserve(self) -> float:
+        """
+        Забирает токен и возвращает, сколько секунд ждать до его появления.
+        Токены уходят в минус, поэтому очередь ждущих обслуживается по порядку.
+        """
+        now = monotonic()
+        self.count_demand(now)
+        if self.rate is None:
+            return 0.0
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def increase(self, step: float, factor: float) -> None:
+        if self.rate is None:
+            return
+
+        self.rate += step
+        if self.max_rate is not None:
+            self.rate = min(self.max_rate, self.rate)
+        elif self.rate * factor > self.current_demand():
+            # Скорость уже не сдерживает спрос даже после следующего снижения — ограничение лишнее
+            self.rate = None
+
+    def decrease(self, factor: float, cooldown: float) -> bool:
+        now = monotonic()
+        if now - self.decreased_at < cooldown:
+            return False
+
+        self.decreased_at = now
+        if self.rate is None:
+            # Первая перегрузка: отсчёт от фактического спроса, а не от условного потолка
+            self.rate = self.current_demand()
+            self.tokens = 0.0
+            self.updated_at = now
+        self.rate = max(self.min_rate, self.rate * factor, RATE_FLOOR)
+        if self.max_rate is not None:
+            self.rate = min(self.max_rate, self.rate)
+        return True
+
+
+class RateLimiter:
+    """
+    share — доля общего лимита на этот процесс (1 / число воркеров).
+    """
+
+    def __init__(self, share: float = 1.0):
+        self.share = share
+        self.endpoints: dict[str, TokenBucket] = {}
+        self.fleet = self.make_bucket(settings.RATE_LIMIT_GLOBAL_RPS)
+        self.backoffs = 0
+        self.wait_total = 0.0
+
+    def make_bucket(self, rate: float) -> TokenBucket:
+        return TokenBucket(
+            rate * self.share or None,
+            max(settings.RATE_LIMIT_BURST * self.share, 1),
+            min_rate=settings.RATE_LIMIT_MIN_RPS * self.share,
+            max_rate=settings.RATE_LIMIT_MAX_RPS * self.share or None,
+        )
+
+    def get_bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self.endpoints.get(endpoint)
+        if bucket is None:
+            bucket = self.endpoints[endpoint] = self.make_bucket(settings.RATE_LIMIT_RPS)
+        return bucket
+
+    async def acquire(self, endpoint: str) -> None:
+        delay = max(self.get_bucket(endpoint).reserve(), self.fleet.reserve())
+        if delay > 0:
+            self.wait_total += delay
+            await asyncio.sleep(delay)
+
+    def on_success(self, endpoint: str) -> None:
+        step = settings.RATE_LIMIT_INCREASE * self.share
+        self.get_bucket(endpoint).increase(step, settings.RATE_LIMIT_DECREASE)
+        self.fleet.increase(step, settings.RATE_LIMIT_DECREASE)
+
+    def on_overload(self, endpoint: str) -> None:
+        decreased = self.get_bucket(endpoint).decrease(settings.RATE_LIMIT_DECREASE, settings.RATE_LIMIT_COOLDOWN)
+        decreased = self.fleet.decrease(settings.RATE_LIMIT_DECREASE, settings.RATE_LIMIT_COOLDOWN) or decreased
+        if decreased:
+            self.backoffs += 1
+
+    def total_rate(self) -> float:
+        """
+        Суммарная скорость ограниченных эндпоинтов; 0 — ограничений нет.
+        """
+        return sum(bucket.rate for bucket in self.endpoints.values() if bucket.rate is not None)
+
+
+def get_rate_limiter(share: float = 1.0) -> RateLimiter:
+    """
+    share учитывается только при первом вызове: воркер задаёт его до запуска
+    аккаунтов.
+    """
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(share)
+
+    return _rate_limiter
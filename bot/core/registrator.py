@@ -1,7 +1,10 @@
 from pyrogram import Client
 
 from bot.config import settings
+from bot.core.preflight import save_session_verdict
+from bot.core.state_store import close_state_store, get_state_store
 from bot.utils import logger
+from bot.utils.sessions import reset_session_names
 
 async def register_sessions() -> None:
     API_ID = settings.API_ID
@@ -25,4 +28,8 @@ async def register_sessions() -> None:
     async with session:
         user_data = await session.get_me()
 
+    reset_session_names()
+    # Сессию с тем же именем могли пересоздать — старый вердикт проверки больше не действует
+    save_session_verdict(get_state_store(), session_name, None)
+    close_state_store()
     logger.success(f'Session added successfully @{user_data.username} | {user_data.first_name} {user_data.last_name}')
@@ -0,0 +1,97 @@
+"""
+Запись и воспроизведение ответов API.
+
+В режиме record каждый запрос SleepagotchiApi (эндпоинт, тело, статус,
+ответ, время) дописывается в архив — gzip с JSON-строками. tgWebAppData не
+сохраняется. В режиме replay ответы отдаются из архива по очереди для каждой
+пары (сессия, эндпоинт), без сети.
+"""
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+from collections import deque
+from time import time
+
+from bot.config import settings
+from bot.utils import logger
+
+API_MODE_LIVE = "live"
+API_MODE_RECORD = "record"
+API_MODE_REPLAY = "replay"
+
+_api_archive = None
+
+
+def read_archive(path: str) -> list[dict]:
+    """
+    Читает архив вместе с частями, записанными воркерами (path.<pid>).
+    """
+    records = []
+    for part in [path, *sorted(glob.glob(f"{path}.*"))]:
+        if not os.path.exists(part):
+            continue
+        with gzip.open(part, "rt", encoding="utf-8") as file:
+            records.extend(json.loads(line) for line in file if line.strip())
+
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+class ApiRecorder:
+    def __init__(self, path: str):
+        # У каждого воркера свой файл, чтобы процессы не писали в один gzip
+        if multiprocessing.parent_process() is not None:
+            path = f"{path}.{os.getpid()}"
+        self.path = path
+        self._file = gzip.open(path, "at", encoding="utf-8")
+
+    def record(self, session_name: str, endpoint: str, payload: dict | None, result: dict) -> None:
+        self._file.write(json.dumps({"ts": time(), "session": session_name, "endpoint": endpoint,
+                                     "payload": payload, **result}, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ApiReplayer:
+    def __init__(self, path: str):
+        self.path = path
+        self._responses = {}
+        for record in read_archive(path):
+            self._responses.setdefault((record["session"], record["endpoint"]), deque()).append(record)
+
+        logger.info(f"Loaded <ly>{sum(map(len, self._responses.values()))}</ly> recorded responses from {path}")
+
+    @property
+    def session_names(self) -> list[str]:
+        return sorted({session_name for session_name, _ in self._responses})
+
+    def next(self, session_name: str, endpoint: str) -> dict | None:
+        responses = self._responses.get((session_name, endpoint))
+        return responses.popleft() if responses else None
+
+    def close(self) -> None:
+        self._responses.clear()
+
+
+def get_api_archive() -> ApiRecorder | ApiReplayer | None:
+    global _api_archive
+
+    if _api_archive is None:
+        if settings.API_MODE == API_MODE_RECORD:
+            _api_archive = ApiRecorder(settings.API_ARCHIVE_PATH)
+        elif settings.API_MODE == API_MODE_REPLAY:
+            _api_archive = ApiReplayer(settings.API_ARCHIVE_PATH)
+
+    return _api_archive
+
+
+def close_api_archive() -> None:
+    global _api_archive
+
+    if _api_archive is not None:
+        _api_archive.close()
+
+    _api_archive = None
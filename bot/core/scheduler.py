@@ -0,0 +1,82 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import suppress
+from time import monotonic, time
+
+from bot.utils import logger
+
+
+class Scheduler:
+    """
+    Единый планировщик аккаунтов: min-heap по времени следующего запуска.
+
+    Задача — асинхронная функция без аргументов, которая возвращает время
+    следующего запуска (unix-время, сек) или None, чтобы снять её с планировщика.
+    Пока задача ждёт своей очереди, она не занимает ни корутину, ни таймер.
+    Внутри куча держит сроки по монотонным часам, поэтому перевод системных
+    часов не сдвигает уже запланированные пробуждения.
+    """
+
+    def __init__(self, max_concurrent: int = 0):
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._running = set()
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def active(self) -> int:
+        return len(self._running)
+
+    def next_due(self) -> float | None:
+        return time() + self._heap[0][0] - monotonic() if self._heap else None
+
+    def schedule(self, name: str, job, due_at: float | None = None) -> None:
+        deadline = monotonic()
+        if due_at is not None:
+            deadline += due_at - time()
+
+        seq = next(self._counter)
+        heapq.heappush(self._heap, (deadline, seq, name, job))
+
+        # Будим цикл, только если новая задача стала ближайшей
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        while self._heap or self._running:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                continue
+
+            _, _, name, job = heapq.heappop(self._heap)
+            task = asyncio.create_task(self._execute(name, job))
+            self._running.add(task)
+
+    async def _execute(self, name: str, job) -> None:
+        next_due = None
+        try:
+            if self._semaphore is not None:
+                async with self._semaphore:
+                    next_due = await job()
+            else:
+                next_due = await job()
+        except Exception as error:
+            logger.error(f"{name} | Unknown error in scheduled job: <light-yellow>{error}</light-yellow>")
+        finally:
+            self._running.discard(asyncio.current_task())
+            if next_due is not None:
+                self.schedule(name, job, next_due)
+            self._wakeup.set()
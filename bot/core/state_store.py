@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import sqlite3
+
+from bot.config import settings
+from bot.utils import logger
+
+_state_store = None
+
+
+class StateStore:
+    """
+    Хранилище состояния аккаунтов: SQLite в режиме WAL за кэшем в памяти.
+
+    Чтение идёт только из кэша, запись помечает ключ «грязным», а flush()
+    сбрасывает все изменения одной транзакцией. Значения хранятся в JSON.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100):
+        self.path = path
+        self.batch_size = batch_size
+        self._cache = {}
+        self._dirty = set()
+
+        self._connection = sqlite3.connect(path, timeout=10)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS account_state ("
+            "session_name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (session_name, key))"
+        )
+        self._connection.commit()
+
+        for session_name, key, value in self._connection.execute(
+                "SELECT session_name, key, value FROM account_state"):
+            self._cache[(session_name, key)] = json.loads(value)
+
+    def get(self, session_name: str, key: str, default=None):
+        return self._cache.get((session_name, key), default)
+
+    def set(self, session_name: str, key: str, value) -> None:
+        cache_key = (session_name, key)
+        if cache_key in self._cache and self._cache[cache_key] == value:
+            return
+
+        self._cache[cache_key] = value
+        self._dirty.add(cache_key)
+
+        if len(self._dirty) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+
+        rows = [(session_name, key, json.dumps(self._cache[(session_name, key)]))
+                for session_name, key in self._dirty]
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO account_state (session_name, key, value) VALUES (?, ?, ?)", rows)
+        self._dirty.clear()
+
+    def migrate_min_index_json(self, json_path: str) -> int:
+        """
+        Одноразовый перенос стартовых индексов из старого min_index.json.
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as error:
+            logger.warning(f"Unable to migrate <ly>{json_path}</ly>: {error}")
+            return 0
+
+        migrated = 0
+        for session_name, values in data.items():
+            if "min_index" in values and (session_name, "min_index") not in self._cache:
+                self.set(session_name, "min_index", values["min_index"])
+                migrated += 1
+
+        self.flush()
+        os.replace(json_path, f"{json_path}.migrated")
+        logger.info(f"Migrated <ly>{migrated}</ly> start indexes from {json_path} to {self.path}")
+
+        return migrated
+
+    async def run_flusher(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+
+def get_state_store() -> StateStore:
+    global _state_store
+
+    if _state_store is None:
+        _state_store = StateStore(settings.STATE_DB_PATH, batch_size=settings.STATE_FLUSH_BATCH)
+        _state_store.migrate_min_index_json("min_index.json")
+
+    return _state_store
+
+
+def close_state_store() -> None:
+    global _state_store
+
+    if _state_store is not None:
+        _state_store.close()
+
+    _state_store = None
@@ -1,56 +1,53 @@
 import asyncio
-import json
-import os
 import random
 import re
-import sys
-from datetime import datetime
-from time import time
+from time import perf_counter, time
 from urllib.parse import unquote
 
-import aiohttp
-import pytz
-from aiocfscrape import CloudflareScraper
-from pyrogram import Client
-from pyrogram.errors import Unauthorized, UserDeactivated, AuthKeyUnregistered
-from pyrogram.raw import types
-from pyrogram.raw.functions.messages import RequestAppWebView
-
 from bot.config import settings
+from bot.core.actions import ACTION_CHALLENGES, ACTION_GACHA, ACTION_SHOP, ACTION_SYNC, ActionSchedule
+from bot.core.api import SleepagotchiApi, ApiResult, ERROR_AUTH, ERROR_CLIENT
+from bot.core.assignment import assign_heroes
+from bot.core.circuit_breaker import get_circuit_breaker
+from bot.core.clock import format_server_time, get_server_clock, remaining
+from bot.core.connections import TelegramClientManager
+from bot.core.constellations import ConstellationCache
 from bot.core.helper import format_duration
+from bot.core import metrics
+from bot.core.leveling import LevelUpPlan, get_level_cost_model, plan_level_ups
+from bot.core.mirror import PlayerMirror
+from bot.core.models import Constellation
+from bot.core.preflight import get_invalid_verdict, save_session_verdict
+from bot.core.state_store import get_state_store
 from bot.exceptions import InvalidSession
 from bot.utils import logger
+from bot.utils.dashboard import status_board
+from bot.utils.logger import lazy_logger, set_phase, set_session
 from bot.utils.logger import SelfTGClient
-from .headers import headers
-
-wib = pytz.timezone('Europe/Kyiv')
-
-url_end_point = "https://tgapi.sleepagotchi.com/v1/tg"
-user_data = f"{url_end_point}/getUserData?"
-all_heroes = f"{url_end_point}/getAllHeroes?"
-spend_gacha = f"{url_end_point}/spendGacha?"
-get_clan = f"{url_end_point}/getClan?"
-get_shop = f"{url_end_point}/getShop?"
-buy_shop = f"{url_end_point}/buyShop?"
-get_constellations = f"{url_end_point}/getConstellations?"
-send_to_challenge = f"{url_end_point}/sendToChallenge?"
-send_to_clan_challenge = f"{url_end_point}/sendToClanChallenge?"
-level_up_hero = f"{url_end_point}/levelUpHero?"
-get_daily_rewards = f"{url_end_point}/getDailyRewards?"
-claim_daily_rewards = f"{url_end_point}/claimDailyRewards?"
-star_up_hero = f"{url_end_point}/starUpHero?"
-claim_challenges_rewards = f"{url_end_point}/claimChallengesRewards?"
 
 self_tg_client = SelfTGClient()
 
 
 class Tapper:
-    def __init__(self, tg_client: Client):
-        self.player = None
-        self.min_index_file = "min_index.json"
+    def __init__(self, session_name: str, tg_clients: TelegramClientManager):
+        # Локальное зеркало игрока: ответы мутаций применяются к нему как дельты
+        self.mirror = PlayerMirror()
         self.next_unlock_time = None
-        self.session_name = tg_client.name
-        self.tg_client = tg_client
+        self.session_name = session_name
+        self.tg_clients = tg_clients
+        self.api = SleepagotchiApi(self.session_name)
+        self.clock = get_server_clock()
+        # Ближайший срок по часам сервера (мс), к которому запланирован следующий цикл
+        self.wake_at = None
+        self.wake_deadline = None
+        # Первое пробуждение — полная синхронизация, она назначит сроки остальным действиям
+        self.actions = ActionSchedule()
+        self.actions.register(ACTION_SYNC, self.sync, due_at=0)
+        self.actions.register(ACTION_GACHA, self.claim_free_gacha, self.has_player)
+        self.actions.register(ACTION_SHOP, self.claim_free_shop, self.has_player)
+        self.actions.register(ACTION_CHALLENGES, self.check_challenges, self.has_player)
+        self.state = get_state_store()
+        self.constellation_cache = ConstellationCache(ttl=settings.CONSTELLATION_CACHE_TTL)
         self.user_id = 0
         self.username = None
         self.first_name = None
@@ -59,19 +56,26 @@ class Tapper:
         self.start_param = None
         self.wait_time = 0
         self.peer = None
+        self.peer_data = None
+        self.phase = None
+        self.phase_started = 0.0
         self.first_run = None
         self.game_service_is_unavailable = False
         self.already_joined_squad_channel = None
-        self.user = None
         self.socket = None
         self.socket_task = None
         self.current_user_balance = 0
-        self.access_token_created_time = time()
-        self.token_live_time = random.randint(500, 900)
+        self.active = True
+        self.login_need = True
+        self.tries_to_login = 4
+        self.tg_web_data = None
+        self.auth_expires_at = 0
+        self.auth_refresh_jitter = random.uniform(0, settings.AUTH_REFRESH_MARGIN / 2)
+        self.auth_lock = asyncio.Lock()
         self.chat_instance = None
-        self.user_info = None
-        self.status = None
-        self.current_gold = 0
+        self.status = status_board.get(session_name)
+
+        self.load_auth_cache()
 
     @staticmethod
     def check_timeout_error(error):
@@ -84,28 +88,15 @@ class Tapper:
 
     def load_min_index(self):
         """
-        Загружает стартовый индекс для конкретного аккаунта.
+        Загружает стартовый индекс для конкретного аккаунта; None, если он ещё не найден.
         """
-        if os.path.exists(self.min_index_file):
-            with open(self.min_index_file, "r") as file:
-                data = json.load(file)
-                return data.get(str(self.session_name), {}).get("min_index", 0)
-        return 0
+        return self.state.get(self.session_name, "min_index")
 
     def save_min_index(self, index):
         """
         Сохраняет стартовый индекс для конкретного аккаунта.
         """
-        data = {}
-        if os.path.exists(self.min_index_file):
-            with open(self.min_index_file, "r") as file:
-                data = json.load(file)
-
-        # Обновляем индекс для указанного аккаунта
-        data[str(self.session_name)] = {"min_index": index}
-
-        with open(self.min_index_file, "w") as file:
-            json.dump(data, file)
+        self.state.set(self.session_name, "min_index", index)
 
     @staticmethod
     def check_error(error, message):
@@ -116,317 +107,408 @@ class Tapper:
         except Exception as e:
             return False
 
+    def load_auth_cache(self) -> None:
+        """
+        Восстанавливает из хранилища peer бота, данные пользователя и tgWebAppData.
+        """
+        cached = self.state.get(self.session_name, "auth")
+        if not cached:
+            return
+
+        self.peer_data = cached.get("peer")
+
+        user = cached.get("user") or {}
+        self.user_id = user.get("id", 0)
+        self.first_name = user.get("first_name", "")
+        self.last_name = user.get("last_name", "")
+        self.username = user.get("username", "")
+
+        if cached.get("expires_at", 0) > time():
+            self.tg_web_data = cached["tg_web_data"]
+            self.auth_expires_at = cached["expires_at"]
+            # Живой кэш — вход через Telegram не нужен, пока API не ответит 401/403
+            self.login_need = False
+
+    def save_auth_cache(self) -> None:
+        if self.peer is not None:
+            self.peer_data = {"user_id": self.peer.user_id, "access_hash": self.peer.access_hash}
+
+        self.state.set(self.session_name, "auth", {
+            "tg_web_data": self.tg_web_data,
+            "expires_at": self.auth_expires_at,
+            "peer": self.peer_data,
+            "user": {
+                "id": self.user_id,
+                "first_name": self.first_name,
+                "last_name": self.last_name,
+                "username": self.username,
+            },
+        })
+
+    @staticmethod
+    def get_auth_date(tg_web_data: str) -> int:
+        auth_date = re.search(r'auth_date=(\d+)', tg_web_data)
+        return int(auth_date.group(1)) if auth_date else int(time())
+
+    def has_valid_auth(self) -> bool:
+        return self.tg_web_data is not None and time() < self.auth_expires_at
+
+    def get_auth_refresh_at(self) -> float:
+        return self.auth_expires_at - settings.AUTH_REFRESH_MARGIN - self.auth_refresh_jitter
+
+    async def login(self, refresh: bool = False) -> None:
+        async with self.auth_lock:
+            # Токен мог обновиться, пока ждали блокировку
+            if refresh and self.get_auth_refresh_at() > time():
+                return
+            if not refresh and not self.login_need and self.has_valid_auth():
+                return
+
+            tg_web_data = await self.get_tg_web_data()
+            if tg_web_data:
+                self.tg_web_data = tg_web_data
+                self.auth_expires_at = self.get_auth_date(tg_web_data) + settings.AUTH_TOKEN_TTL
+                self.login_need = False
+                self.save_auth_cache()
+                metrics.inc("token_refreshes")
+
+                if not self.first_run:
+                    logger.success("Logged in successfully")
+                    self.first_run = True
+
+    def enter_phase(self, phase: str | None) -> None:
+        """
+        Переключает фазу цикла: пишет её в контекст логов и отдаёт длительность
+        предыдущей фазы в метрики. None закрывает последнюю фазу.
+        """
+        now = perf_counter()
+        if self.phase is not None:
+            metrics.observe_phase(self.phase, now - self.phase_started)
+
+        self.phase = phase
+        self.phase_started = now
+        set_phase(phase or "")
+
+    async def refresh_auth(self) -> float | None:
+        """
+        Фоновое обновление tgWebAppData незадолго до истечения, чтобы цикл не ждал MTProto.
+        Возвращает время следующей проверки.
+        """
+        if not self.active:
+            return None
+
+        if self.get_auth_refresh_at() > time():
+            return self.get_auth_refresh_at()
+
+        set_session(self.session_name)
+        set_phase("auth")
+        await self.login(refresh=True)
+
+        if not self.has_valid_auth():
+            return time() + random.randint(60, 120)
+        return self.get_auth_refresh_at()
+
     async def get_tg_web_data(self) -> str:
         try:
-            with_tg = True
+            async with self.tg_clients.connection(self.session_name) as tg_client:
+                # pyrogram к этому моменту уже загружен в потоке (preload_pyrogram)
+                from pyrogram.raw import types
+                from pyrogram.raw.functions.messages import RequestAppWebView
 
-            if not self.tg_client.is_connected:
-                with_tg = False
-                try:
-                    await self.tg_client.connect()
-                except (Unauthorized, UserDeactivated, AuthKeyUnregistered):
-                    raise InvalidSession(self.session_name)
+                if settings.USE_REF == True and settings.REF_ID:
+                    ref_id = settings.REF_ID
+                else:
+                    ref_id = '72633a323431393637393935'
 
-            if settings.USE_REF == True and settings.REF_ID:
-                ref_id = settings.REF_ID
-            else:
-                ref_id = '72633a323431393637393935'
+                self.start_param = random.choices([ref_id, '72633a323431393637393935'], weights=[50, 50])[0]
 
-            self.start_param = random.choices([ref_id, '72633a323431393637393935'], weights=[50, 50])[0]
+                if self.peer is None and self.peer_data:
+                    self.peer = types.InputPeerUser(user_id=self.peer_data["user_id"],
+                                                    access_hash=self.peer_data["access_hash"])
 
-            peer = await self.tg_client.resolve_peer('sleepagotchiLITE_bot')
-            input_bot_app = types.InputBotAppShortName(bot_id=peer, short_name="game")
+                peer = self.peer
+                if peer is None:
+                    peer = await tg_client.resolve_peer('sleepagotchiLITE_bot')
+                    self.peer = peer
 
-            web_view = await self.tg_client.invoke(RequestAppWebView(
-                peer=peer,
-                app=input_bot_app,
-                platform='android',
-                write_allowed=True,
-                start_param=self.start_param
-            ))
+                input_bot_app = types.InputBotAppShortName(bot_id=peer, short_name="game")
 
-            auth_url = web_view.url
+                web_view = await tg_client.invoke(RequestAppWebView(
+                    peer=peer,
+                    app=input_bot_app,
+                    platform='android',
+                    write_allowed=True,
+                    start_param=self.start_param
+                ))
 
-            tg_web_data = unquote(
-                string=auth_url.split('tgWebAppData=', maxsplit=1)[1].split('&tgWebAppVersion', maxsplit=1)[0])
+                auth_url = web_view.url
 
-            self.chat_instance = re.findall(r'chat_instance=([^&]+)', tg_web_data)[0]
+                tg_web_data = unquote(
+                    string=auth_url.split('tgWebAppData=', maxsplit=1)[1].split('&tgWebAppVersion', maxsplit=1)[0])
 
-            try:
-                if self.user_id == 0:
-                    information = await self.tg_client.get_me()
-                    self.user_id = information.id
-                    self.first_name = information.first_name or ''
-                    self.last_name = information.last_name or ''
-                    self.username = information.username or ''
-            except Exception as e:
-                print(e)
+                self.chat_instance = re.findall(r'chat_instance=([^&]+)', tg_web_data)[0]
 
-            if with_tg is False:
-                await self.tg_client.disconnect()
+                try:
+                    if self.user_id == 0:
+                        information = await tg_client.get_me()
+                        self.user_id = information.id
+                        self.first_name = information.first_name or ''
+                        self.last_name = information.last_name or ''
+                        self.username = information.username or ''
+                except Exception as e:
+                    print(e)
 
             return tg_web_data
 
         except InvalidSession as error:
             logger.error(f"Session error during Authorization: <light-yellow>{error}</light-yellow>")
-            await asyncio.sleep(delay=10)
+            # Сессия нерабочая — аккаунт снимается, следующий запуск её пропустит
+            save_session_verdict(self.state, self.session_name, get_invalid_verdict(error))
+            self.active = False
 
         except Exception as error:
             logger.error(
                 f"Unknown error during Authorization: <light-yellow>{error}</light-yellow>")
             await asyncio.sleep(delay=random.randint(3, 8))
 
-    async def user_data(self, http_client: aiohttp.ClientSession, query, show_error_message: bool):
-        err = None
-        first = True
-        url = f"{user_data}{query}"
-        for _ in range(3):
-            try:
-                response = await http_client.get(url)
-                response.raise_for_status()
-                data = await response.json()
-                err = None
-                return data
-            except Exception as error:
-                if first:
-                    first = False
-                    logger.info(f"First get user info request not always successful, retrying..")
-                await asyncio.sleep(delay=random.randint(3, 6))
-                err = error
-                continue
+    def log_api_error(self, result: ApiResult, action: str) -> None:
+        if result.error_kind == ERROR_AUTH:
+            self.login_need = True
+        elif result.error_kind == ERROR_CLIENT:
+            # Сервер отклонил действие, которое зеркало считало допустимым
+            self.mirror.mark_stale()
 
-        if err is not None and show_error_message == True:
-            if self.check_timeout_error(err) or self.check_error(err, "Service Unavailable"):
-                logger.warning(
-                    f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not response.")
-            else:
-                logger.error(f"Unknown error during getting user info: <light-yellow>{err}</light-yellow>")
-            return None
+        self.status.record_error(f"{result.endpoint}: {result.error}")
+
+        if result.is_unavailable:
+            logger.warning(f"Warning during {action}: <magenta>Sleepagotchi</magenta> server is not response.")
+        else:
+            logger.error(f"Unknown error during {action}: <light-yellow>{result.error}</light-yellow>")
+
+    async def user_data(self, query, show_error_message: bool) -> ApiResult:
+        result = await self.api.request("getUserData", query)
+        if not result.ok and show_error_message:
+            self.log_api_error(result, "getting user info")
+        return result
 
-    async def find_start_index(self, http_client, query, constellations_last_index):
+    @staticmethod
+    def get_first_incomplete_index(constellations: list[Constellation]):
+        for constellation in constellations:
+            # Если хотя бы одно испытание не завершено
+            if any(not challenge.is_complete for challenge in constellation.challenges):
+                return constellation.index
+        return None
+
+    async def find_start_index(self, query, constellations_last_index):
         """
         Поиск первого индекса, где хотя бы одно испытание не завершено.
+        Созвездия запрашиваются страницами фиксированного размера: подряд до первой
+        незавершённой страницы (paged) или бинарным поиском по «завершённому префиксу» (bisect).
         """
-        constellations = await self.get_constellations(http_client, query, start_index=0,
-                                                       amount=constellations_last_index)
-        if constellations.get("status") == "success":
-            for constellation in constellations["data"]["constellations"]:
-                index = constellation.get("index")
-                challenges = constellation.get("challenges", [])
+        page_size = settings.START_INDEX_PAGE_SIZE
+        bisect = settings.START_INDEX_DISCOVERY == "bisect"
+        low, high = 0, -(-constellations_last_index // page_size)
+        start_index = None
+
+        while low < high:
+            page = (low + high) // 2 if bisect else low
+            page_start = page * page_size
+            result = await self.get_constellations(query, start_index=page_start,
+                                                   amount=min(page_size, constellations_last_index - page_start))
+            if not result.ok:
+                logger.warning(f"Не удалось найти стартовый индекс для аккаунта {self.session_name}. Повторим позже.")
+                return constellations_last_index + 1
+
+            index = self.get_first_incomplete_index(Constellation.from_list(result.data.get("constellations", [])))
+            if index is None:
+                low = page + 1
+                continue
 
-                # Если хотя бы одно испытание не завершено
-                if any(c["received"] < c["value"] for c in challenges):
-                    self.save_min_index(index)
-                    logger.info(f"Стартовый индекс для аккаунта {self.session_name} установлен: {index}")
-                    return index
+            start_index = index
+            # Граница внутри страницы — префикс до неё завершён
+            if not bisect or index != page_start:
+                break
+            high = page
 
-        # Если все испытания завершены
-        self.save_min_index(constellations_last_index + 1)
-        logger.info(f"Все испытания завершены для аккаунта {self.session_name}.")
-        return constellations_last_index + 1
+        if start_index is None:
+            # Если все испытания завершены
+            start_index = constellations_last_index + 1
+            logger.info(f"Все испытания завершены для аккаунта {self.session_name}.")
+        else:
+            logger.info(f"Стартовый индекс для аккаунта {self.session_name} установлен: {start_index}")
+
+        self.save_min_index(start_index)
+        return start_index
+
+    async def spend_gacha(self, query, amount, strategy) -> ApiResult:
+        result = await self.api.request("spendGacha", query, {"amount": amount, "strategy": strategy})
+        if result.ok:
+            self.mirror.apply_gacha(amount, strategy, result.data, self.clock.server_now_ms())
+            for hero in result.data.get('heroCard', []):
+                logger.info(
+                    f"<green>[Успех]</> Получен герой типа {hero['heroType']} в количестве {hero['amount']}"
+                )
+        else:
+            self.log_api_error(result, "spending gacha")
+        return result
+
+    async def claim_daily_rewards(self, query) -> ApiResult:
+        result = await self.api.request("claimDailyRewards", query)
+        if result.ok:
+            self.mirror.apply_daily_reward(result.data)
+            if 'rewards' in result.data:
+                rewards = result.data['rewards']
+                logger.success(
+                    f"<green>[Успех]</green> Получена награда {rewards['rewardType']} в количестве {rewards['rewardAmount']}"
+                )
+        else:
+            self.log_api_error(result, "claiming daily rewards")
+        return result
 
-    async def get_start_index(self, http_client, query, constellations_last_index):
-        """
-        Получение стартового индекса для конкретного аккаунта: из файла или через поиск.
-        """
-        saved_index = self.load_min_index()
+    async def get_shop(self, query) -> ApiResult:
+        result = await self.api.request("getShop", query)
+        if not result.ok:
+            self.log_api_error(result, "getting shop")
+        return result
+
+    @staticmethod
+    def get_free_slot_claim_time(shop: ApiResult) -> int | None:
+        if not shop.ok:
+            return None
+        return next((item['nextClaimAt'] for item in shop.data.get('shop', []) if item.get('slotType') == 'free'),
+                    None)
 
-        if saved_index <= constellations_last_index:
-            logger.info(f"Используем сохранённый индекс для аккаунта {self.session_name}: {saved_index}")
-            return saved_index
+    async def buy_shop(self, query, slot_type) -> ApiResult:
+        result = await self.api.request("buyShop", query, {"slotType": slot_type})
+        if result.ok:
+            self.mirror.apply_player(result.data)
         else:
-            logger.info("Сохранённый индекс некорректен. Запускаем поиск актуального индекса...")
-            return await self.find_start_index(http_client, query, constellations_last_index)
-
-    async def spend_gacha(self, http_client: aiohttp.ClientSession, query, amount, strategy):
-        url = str(f"{spend_gacha}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.post(url, json={"amount": amount, "strategy": strategy})
-                response.raise_for_status()
-                data = await response.json()
-                if 'heroCard' in data:
-                    for hero in data['heroCard']:
-                        logger.info(
-                            f"<green>[Успех]</> Получен герой типа {hero['heroType']} в количестве {hero['amount']}"
-                        )
-                return {"status": "success", "data": data}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting template info: <magenta>Sleepagotchi</magenta> server is not response. Retrying..")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    if error:
-                        logger.error(
-                            f"Unknown error during getting template info: <light-yellow>{error}</light-yellow>")
-                    else:
-                        logger.error(f"Unknown error during getting template info.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
+            self.log_api_error(result, "buying in shop")
+        return result
 
-    async def claim_daily_rewards(self, http_client: aiohttp.ClientSession, query):
-        url = str(f"{claim_daily_rewards}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.get(url)
-                response.raise_for_status()
-                data = await response.json()
-                if 'rewards' in data:
-                    rewards = data['rewards']
-                    logger.success(
-                        f"<green>[Успех]</green> Получена награда {rewards['rewardType']} в количестве {rewards['rewardAmount']}"
+    async def star_up_hero(self, query, hero_type) -> ApiResult:
+        result = await self.api.request("starUpHero", query, {"heroType": hero_type})
+        if result.ok:
+            self.mirror.apply_star_up(hero_type, result.data)
+        else:
+            self.log_api_error(result, "hero star up")
+        return result
+
+    async def lvl_up_hero(self, query, hero_type) -> ApiResult:
+        logger.info(f"Отправляем запрос на повышение уровня героя <green> {hero_type}</green>")
+        result = await self.api.request("levelUpHero", query,
+                                        {"heroType": hero_type, "strategy": settings.LEVEL_UP_STRATEGY})
+        if not result.ok:
+            self.log_api_error(result, "hero level up")
+        return result
+
+    async def run_level_up_plan(self, query, plans: list[LevelUpPlan]) -> None:
+        total_gold = sum(plan.gold for plan in plans)
+        total_green = sum(plan.green for plan in plans)
+        # «≥» — прирост стоимости для редкости героя ещё не известен, сумма занижена
+        bound = "" if all(plan.exact for plan in plans) else "≥ "
+        logger.info(f"<yellow>План прокачки:</yellow> {len(plans)} героев, "
+                    f"🪙 {bound}{total_gold:,} золота, 🟢 {bound}{total_green:,} зелёных камней")
+        for plan in plans:
+            plan_bound = "" if plan.exact else "≥ "
+            logger.info(f"  <green>{plan.hero_type}</green>: {plan.from_level} → {plan.target_level} "
+                        f"(🪙 {plan_bound}{plan.gold:,}, 🟢 {plan_bound}{plan.green:,})")
+
+        costs = get_level_cost_model()
+
+        heroes = {hero.hero_type: hero for hero in self.player.heroes}
+        for plan in plans:
+            hero = heroes[plan.hero_type]
+            while hero.level < plan.target_level:
+                resources = self.player.resources
+                # План — оценка стоимости: перед каждым запросом сверяемся с зеркалом
+                if hero.cost_level_gold > resources.amount('gold') or \
+                        hero.cost_level_green > resources.amount('greenStones'):
+                    logger.warning(f"Недостаточно ресурсов для дальнейшей прокачки {hero.hero_type}.")
+                    return
+
+                hero_lvl_up = await self.lvl_up_hero(query, hero_type=hero.hero_type)
+
+                if not hero_lvl_up.ok:
+                    logger.error(
+                        f"<red>Не удалось улучшить {hero.hero_type}. "
+                        f"Ошибка: {hero_lvl_up.error}</>"
                     )
-                return {"status": "success", "data": data}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Unknown error during getting user info: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
+                    return
 
-    async def get_shop(self, http_client: aiohttp.ClientSession, query):
-        url = str(f"{get_shop}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.get(url)
-                response.raise_for_status()
-                data = await response.json()
-                shop_items = data.get('shop', [])
-                next_claim_free_slot = next(
-                    (item['nextClaimAt'] for item in shop_items if item.get('slotType') == 'free'), None)
-                return {"status": "success", "data": data, "next_claim_free_slot": next_claim_free_slot}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Unknown error during getting user info: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
+                # Получаем новый уровень героя и фактическую стоимость следующего
+                hero_from_response = hero_lvl_up.data.get('hero', {})
+                new_level = hero_from_response.get('level')
+                if new_level is None:
+                    logger.error(
+                        f"<red>Не удалось получить новый уровень для {hero.hero_type}. "
+                        f"Ответ API: {hero_lvl_up.data}</>"
+                    )
+                    return
 
-    async def buy_shop(self, http_client: aiohttp.ClientSession, query, slot_type):
-        url = str(f"{buy_shop}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.post(url, json={"slotType": slot_type})
-                response.raise_for_status()
-                return {"status": "success", "data": await response.json()}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Unknown error during getting user info: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
+                gold_before, green_before = hero.cost_level_gold, hero.cost_level_green
+                self.mirror.apply_level_up(hero, hero_lvl_up.data)
+                if 'costLevelGold' in hero_from_response:
+                    costs.observe(hero, gold_before, green_before)
+                logger.success(f"Успешно улучшен <green> {hero.hero_type} до Уровня {new_level}</>")
+                logger.info(f"Текущее золото: {self.player.resources.amount('gold')}")
 
-    async def star_up_hero(self, http_client: aiohttp.ClientSession, query, hero_type):
-        url = str(f"{star_up_hero}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.post(url, json={"heroType": hero_type})
-                response.raise_for_status()
-                return {"status": "success", "data": await response.json()}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Unknown error during getting user info: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
+                if settings.LEVEL_UP_DELAY[1] > 0:
+                    await asyncio.sleep(random.uniform(*settings.LEVEL_UP_DELAY))
 
-    async def lvl_up_hero(self, http_client: aiohttp.ClientSession, query, hero_type):
-        url = str(f"{level_up_hero}{query}")
-        for _ in range(3):
-            try:
-                await asyncio.sleep(random.uniform(1, 3))
-                logger.info(f"Отправляем запрос на повышение уровня героя <green> {hero_type}</green>")
-                response = await http_client.post(url, json={"heroType": hero_type,"strategy":"one"})
-                response.raise_for_status()
-                data = await response.json()
-                return {"status": "success", "data": data}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Unknown error during getting user info: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
+    async def load_constellation_window(self, query, constellations_last_index) -> tuple[int, int, list | None]:
+        """
+        Стартовый индекс (из хранилища или через поиск) и окно созвездий цикла:
+        от стартового индекса до последнего + 5.
+        """
+        start_index = self.load_min_index()
+        if start_index is not None:
+            logger.info(f"📂 Загружен стартовый индекс для аккаунта {self.session_name}: <cyan>{start_index}</cyan>")
 
-    async def get_constellations(self, http_client: aiohttp.ClientSession, query, start_index, amount):
-        url = str(f"{get_constellations}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.post(url, json={"startIndex": start_index, "amount": amount})
-                response.raise_for_status()
-                data = await response.json()
-
-                return {"status": "success", "data": data}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Unknown error during getting user info: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-
-    async def get_clan(self, http_client: aiohttp.ClientSession, query, clan_id):
-        url = str(f"{get_clan}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.post(url, json={"clanId": clan_id})
-                response.raise_for_status()
-                data = await response.json()
-                return {"status": "success", "data": data}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting clan info: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Unknown error during getting clan info: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-
-    async def claim_challenges_rewards(self, http_client: aiohttp.ClientSession, query):
-        url = str(f"{claim_challenges_rewards}{query}")
-        for _ in range(3):
-            try:
-                response = await http_client.get(url)
-                response.raise_for_status()
-                return {"status": "success", "data": await response.json()}
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting challenges rewards: <magenta>Sleepagotchi</magenta> server is not response.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(
-                        f"Unknown error during getting challenges rewards: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
+        if start_index is None or start_index > constellations_last_index:
+            logger.info("<yellow>🔄 Запуск поиска актуального стартового индекса...</yellow>")
+            start_index = await self.find_start_index(query, constellations_last_index)
+
+        window_end = constellations_last_index + 5
+        window = await self.get_constellation_window(query, min(start_index, constellations_last_index),
+                                                      window_end, constellations_last_index)
+        return start_index, window_end, window
+
+    async def get_constellation_window(self, query, start_index, end_index, constellations_last_index):
+        """
+        Окно созвездий [start_index, end_index) из кэша; запрос к API только если кэш устарел.
+        """
+        if not self.constellation_cache.covers(start_index, end_index, constellations_last_index):
+            result = await self.get_constellations(query, start_index=start_index, amount=end_index - start_index)
+            if not result.ok:
+                return None
+            self.constellation_cache.store(Constellation.from_list(result.data.get("constellations", [])),
+                                           start_index, end_index,
+                                           constellations_last_index)
+
+        return self.constellation_cache.window(start_index, end_index)
+
+    async def get_constellations(self, query, start_index, amount) -> ApiResult:
+        result = await self.api.request("getConstellations", query, {"startIndex": start_index, "amount": amount})
+        if not result.ok:
+            self.log_api_error(result, "getting constellations")
+        return result
+
+    async def get_clan(self, query, clan_id) -> ApiResult:
+        result = await self.api.request("getClan", query, {"clanId": clan_id})
+        if not result.ok:
+            self.log_api_error(result, "getting clan info")
+        return result
+
+    async def claim_challenges_rewards(self, query) -> ApiResult:
+        result = await self.api.request("claimChallengesRewards", query)
+        if result.ok:
+            self.mirror.apply_player(result.data)
+        else:
+            self.log_api_error(result, "getting challenges rewards")
+        return result
 
-    async def send_to_challenge(self, http_client: aiohttp.ClientSession, query, challenge_type, heroes):
-        url = str(f"{send_to_challenge}{query}")
+    async def send_to_challenge(self, query, challenge_type, heroes) -> ApiResult:
         payload = {
             "challengeType": challenge_type,
             "heroes": [
@@ -434,567 +516,545 @@ class Tapper:
                 for hero in heroes
             ]
         }
-        for _ in range(3):
-            try:
-                response = await http_client.post(url, json=payload)
-                response.raise_for_status()
-                data = await response.json()
-                await asyncio.sleep(delay=random.randint(3, 5))
-                return {"status": "success", "data": data}
-            except aiohttp.ClientResponseError as e:
-                if self.check_timeout_error(e) or self.check_error(e, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not responding.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Client response error during sending hero <light-yellow>{e}</light-yellow>")
-                    logger.error(f"Response status: {e.status} - Response message: {e.message}")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
-            except Exception as error:
-                logger.error(f"Unknown error during getting send to challenge: <light-yellow>{error}</light-yellow>")
-                await asyncio.sleep(delay=random.randint(3, 5))
-                return None
+        result = await self.api.request("sendToChallenge", query, payload)
+        if result.ok:
+            self.mirror.apply_player(result.data)
+            await asyncio.sleep(random.uniform(*settings.ACTION_DELAY))
+        else:
+            self.log_api_error(result, "sending heroes to challenge")
+        return result
 
-    async def send_to_clan_challenge(self, http_client: aiohttp.ClientSession, query, challenge_type):
-        url = str(f"{send_to_clan_challenge}{query}")
+    async def send_to_clan_challenge(self, query, challenge_type) -> ApiResult:
         payload = {
             "challengeType": challenge_type,
-            "heroes":[{"slotId":0,"heroType":"bonk"}]}
-        for _ in range(3):
-            try:
-                response = await http_client.post(url, json=payload)
-                response.raise_for_status()
-                data = await response.json()
-                await asyncio.sleep(delay=random.randint(3, 5))
-                return {"status": "success", "data": data}
-            except aiohttp.ClientResponseError as e:
-                if self.check_timeout_error(e) or self.check_error(e, "Service Unavailable"):
-                    logger.warning(
-                        f"Warning during getting user info: <magenta>Sleepagotchi</magenta> server is not responding.")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    continue
-                else:
-                    logger.error(f"Client response error during sending hero <light-yellow>{e}</light-yellow>")
-                    logger.error(f"Response status: {e.status} - Response message: {e.message}")
-                    await asyncio.sleep(delay=random.randint(3, 5))
-                    return None
-            except Exception as error:
-                logger.error(f"Unknown error during getting send to challenge: <light-yellow>{error}</light-yellow>")
-                await asyncio.sleep(delay=random.randint(3, 5))
-                return None
+            "heroes": [{"slotId": 0, "heroType": "bonk"}]}
+        result = await self.api.request("sendToClanChallenge", query, payload)
+        if result.ok:
+            self.mirror.apply_player(result.data)
+            await asyncio.sleep(random.uniform(*settings.ACTION_DELAY))
+        else:
+            self.log_api_error(result, "sending hero to clan challenge")
+        return result
+
+    async def collect_gacha(self, query, gacha_amount: int) -> None:
+        if gacha_amount > 0:
+            logger.info(f"<red>Списание гачи: {gacha_amount} 🎉</red>")
+            await self.spend_gacha(query, gacha_amount, "gacha")
+
+    def schedule_free_gacha(self) -> None:
+        next_claim_at = self.player.free_gacha_next_claim
+        self.actions.set_due(ACTION_GACHA, next_claim_at)
+        if next_claim_at > self.clock.server_now_ms():
+            logger.info(f"<magenta>Бесплатный Гача уже получен.</>")
+            logger.info(
+                f"<yellow>Следующий бесплатный гача доступен в:</><cyan> {format_server_time(next_claim_at)}</>")
+
+    async def claim_free_gacha(self, query) -> None:
+        """
+        Действие «бесплатная гача». Срок следующей в ответе не приходит: после
+        первого получения он берётся из данных игрока и запоминается интервал,
+        дальше срок считается локально.
+        """
+        claimed_at = self.clock.server_now_ms()
+        result = await self.spend_gacha(query, 1, "free")
+        if result.ok:
+            logger.success(f"<green>Бесплатный гача получен!</>")
+        else:
+            logger.error(f"<red>Не удалось получить бесплатного гачу: {result.error}</>")
+
+        if not self.mirror.ready:
+            metrics.inc("player_refreshes")
+            if not await self.refresh_player(query):
+                self.actions.set_due(ACTION_GACHA, self.get_retry_at())
+                return
+            if result.ok and self.player.free_gacha_next_claim > claimed_at:
+                self.mirror.gacha_cooldown = self.player.free_gacha_next_claim - claimed_at
+
+        self.schedule_free_gacha()
+        # Новые карточки могли открыть повышение звёзд
+        await self.star_up_heroes(query)
+
+    async def collect_daily_reward(self, query, available: bool) -> None:
+        if available:
+            result = await self.claim_daily_rewards(query)
+            if result.ok:
+                logger.success(f"<green>Ежедневная награда получена!</>")
+            else:
+                logger.error(f"<red>Не удалось получить ежедневную награду: {result.error}</>")
+        else:
+            logger.info(f"<magenta>Ежедневная награда уже получена.</>")
 
+    async def claim_free_shop(self, query) -> None:
+        """
+        Действие «бесплатный слот магазина»: покупка и новый срок из getShop.
+        """
+        result = await self.buy_shop(query, "free")
+        if result.ok:
+            logger.success(f"<green>Награда из магазина получена!</>")
+        else:
+            logger.error(f"<red>Не удалось получить награду из магазина: {result.error}</>")
 
-    async def run(self) -> None:
-        if settings.USE_RANDOM_DELAY_IN_RUN:
-            random_delay = random.randint(settings.RANDOM_DELAY_IN_RUN[0], settings.RANDOM_DELAY_IN_RUN[1])
-            logger.info(f"Bot will start in <ly>{random_delay}s</ly>")
-            await asyncio.sleep(random_delay)
-
-        access_token = None
-        refresh_token = None
-        login_need = True
-
-        http_client = CloudflareScraper(headers=headers)
-
-        self.access_token_created_time = 0
-        self.token_live_time = random.randint(500, 900)
-        tries_to_login = 4
-
-        while True:
-            # Очистка терминала после ожиданием
-            os.system('cls' if os.name == 'nt' else 'clear')
-            try:
-                if time() - self.access_token_created_time >= self.token_live_time:
-                    login_need = True
-
-                if login_need:
-                    self.tg_web_data = await self.get_tg_web_data()
-
-                    self.access_token_created_time = time()
-                    self.token_live_time = random.randint(500, 900)
-
-                    if not self.first_run and self.tg_web_data:
-                        logger.success("Logged in successfully")
-                        self.first_run = True
-
-                    login_need = False
-
-                await asyncio.sleep(3)
-
-            except Exception as error:
-                if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
-                    logger.warning(f"Warning during login: <magenta>Sleepagotchi</magenta> server is not responding.")
-                    if tries_to_login > 0:
-                        tries_to_login -= 1
-                        logger.info(f"Login request not always successful, retrying..")
-                        await asyncio.sleep(delay=random.randint(10, 40))
-                    else:
-                        await asyncio.sleep(delay=5)
-                        break
-                else:
-                    logger.error(f"Unknown error during login: <light-yellow>{error}</light-yellow>")
-                    await asyncio.sleep(delay=5)
-                    break
+        self.schedule_free_shop(await self.get_shop(query))
 
-            try:
-                query = self.tg_web_data
-                user = await self.user_data(http_client=http_client, query=query, show_error_message=True)
-
-                self.user_info = user
-
-                await asyncio.sleep(delay=random.randint(2, 5))
-
-                if user is not None:
-
-                    self.next_unlock_time = None
-                    self.user = user
-                    user_name = user['initData']['first_name']
-                    logger.info(f"<green>Пользователь:</green> <cyan>{user_name}</cyan>")
-                    challenges_rewards = await self.claim_challenges_rewards(http_client, query)
-                    if challenges_rewards["status"] == "success":
-                        logger.success(f"Награда за испытания успешно получена")
-                    self.player = user.get('player', {})
-                    meta = self.player.get('meta', {})
-                    clan = self.player.get('clanInfo', {})
-                    clan_id = clan.get('clanId')
-                    resources = self.player.get('resources', {})
-                    hero_cards = resources.get('heroCard', [])
-                    hero_card_dict = {card['heroType']: card['amount'] for card in hero_cards}
-                    constellations_last_index = meta.get('constellationsLastIndex', 0)
-                    self.current_gold = resources.get('gold', {}).get('amount', 0)
-
-                    logger.info(f"<yellow>Ресурсы:</yellow>")
-                    resource_display = {
-                        'gold': ('🪙', 'yellow'),
-                        'gem': ('💎', 'cyan'),
-                        'greenStones': ('🟢', 'green'),
-                        'purpleStones': ('🟣', 'magenta'),
-                        'orb': ('🔮', 'blue'),
-                        'points': ('⭐', 'white'),
-                        'gacha': ('🎉', 'red'),
-                    }
-
-                    for resource, (emoji, color) in resource_display.items():
-                        if resource in resources:
-                            amount = resources[resource].get('amount', 0)
-                            logger.info(
-                                f"<{color}>{resource.capitalize()}: {emoji} {amount:,}</{color}> {emoji}")
-                            if resource == 'gacha' and amount > 0:
-                                logger.info(f"<red>Списание гачи: {amount} 🎉</red>")
-                                await self.spend_gacha(http_client, query, amount, "gacha")
-
-                    current_time_ms = time() * 1000
-                    current_time = datetime.fromtimestamp(current_time_ms / 1000, tz=pytz.utc).astimezone(wib)
-                    logger.info(f"<yellow>Текущее время:</> <cyan>{current_time.strftime('%H:%M:%S')} </>")
-
-                    free_gacha_next_claim = meta.get('freeGachaNextClaim', 0)
-                    next_gacha_claim_time = datetime.fromtimestamp(free_gacha_next_claim / 1000,
-                                                                   tz=pytz.utc).astimezone(wib)
-
-                    if current_time_ms >= free_gacha_next_claim:
-                        result = await self.spend_gacha(http_client, query, 1, "free")
-                        if result["status"] == "success":
-                            logger.success(f"<green>Бесплатный гача получен!</>")
-                        else:
-                            logger.error(f"<red>Не удалось получить бесплатного гачу: {result['error']}</>")
-                    else:
-                        logger.info(f"<magenta>Бесплатный Гача уже получен.</>")
-                        logger.info(
-                            f"<yellow>Следующий бесплатный гача доступен в:</><cyan> {next_gacha_claim_time.strftime('%H:%M:%S')}</>")
-
-                    # Проверка на получение ежедневной награды
-                    next_daily_reward_available = meta.get('isNextDailyRewardAvailable', False)
-                    if next_daily_reward_available:
-                        result = await self.claim_daily_rewards(http_client, query)
-                        if result["status"] == "success":
-                            logger.success(f"<green>Ежедневная награда получена!</>")
-                        else:
-                            logger.error(f"<red>Не удалось получить ежедневную награду: {result['error']}</>")
-                    else:
-                        logger.info(f"<magenta>Ежедневная награда уже получена.</>")
-
-                    # Проверка на бесплатную награду в магазине
-                    shop_data = await self.get_shop(http_client, query)
-                    shop_next_claim_at = shop_data.get('next_claim_free_slot', 0)
-                    next_shop_claim_time = datetime.fromtimestamp(shop_next_claim_at / 1000,
-                                                                  tz=pytz.utc).astimezone(wib)
-                    if current_time_ms >= shop_next_claim_at:
-                        result = await self.buy_shop(http_client, query, "free")
-                        if result["status"] == "success":
-                            logger.success(f"<green>Награда из магазина получена!</>")
-                        else:
-                            logger.error(f"<red>Не удалось получить награду из магазина: {result['error']}</>")
-                    else:
-                        logger.info(f"<magenta>Награда из магазина уже получена.</>")
+    def schedule_free_shop(self, shop: ApiResult) -> None:
+        if not shop.ok:
+            # Срок неизвестен — повторим скоро, а не на следующей синхронизации
+            self.actions.set_due(ACTION_SHOP, self.get_retry_at())
+            return
+
+        next_claim_at = self.get_free_slot_claim_time(shop)
+        self.actions.set_due(ACTION_SHOP, next_claim_at)
+        if next_claim_at is not None:
+            logger.info(
+                f"<yellow>Следующая награда магазина станет доступна в:</> <cyan>{format_server_time(next_claim_at)}</>")
+
+    async def star_up_heroes(self, query) -> None:
+        """
+        Повышает звёзды всем героям, на которых хватает карточек; запросы по разным героям независимы.
+        """
+        hero_cards = self.player.resources.hero_cards
+        heroes = [
+            hero.hero_type for hero in self.player.heroes
+            if hero.hero_type in hero_cards and hero_cards[hero.hero_type] >= hero.cost_star and hero.unlock_at == 0
+        ]
+        results = await asyncio.gather(*(self.star_up_hero(query, hero_type) for hero_type in heroes))
+
+        for hero_type, result in zip(heroes, results):
+            if result.ok:
+                logger.success(f"Успешно повышены звёзды для <green> {hero_type}</>")
+            else:
+                logger.error(f"<red>Не удалось повысить звёзды для {hero_type}. Ошибка: {result.error}</>")
+
+    def has_player(self) -> bool:
+        return self.player is not None
+
+    def get_retry_at(self) -> int:
+        return self.clock.server_now_ms() + random.randint(*settings.ACTION_RETRY_DELAY) * 1000
+
+    @property
+    def player(self):
+        return self.mirror.player
+
+    async def refresh_player(self, query) -> bool:
+        """
+        Полная сверка зеркала с сервером.
+        """
+        result = await self.user_data(query=query, show_error_message=True)
+        if not result.ok:
+            return False
+
+        self.reconcile(result.data.get('player', {}))
+        return True
+
+    def reconcile(self, data: dict) -> None:
+        mismatches = self.mirror.replace(data)
+        if mismatches:
+            metrics.inc("mirror_mismatches")
+            logger.warning(f"Локальное состояние разошлось с сервером: {', '.join(mismatches[:5])}")
+
+    async def sync(self, query) -> None:
+        """
+        Полная синхронизация: данные игрока, магазин, ежедневные награды,
+        звёзды, прокачка и испытания. Назначает сроки остальным действиям.
+        """
+        self.enter_phase("user")
+
+        async def claim_then_user_data() -> tuple[ApiResult, ApiResult]:
+            # getUserData после получения наград: снимок, снятый до них, откатил бы
+            # зеркало и дал ложные расхождения при сверке
+            rewards = await self.claim_challenges_rewards(query)
+            return rewards, await self.user_data(query=query, show_error_message=True)
+
+        # Магазин от них не зависит и запрашивается параллельно, в пределах лимита запросов аккаунта
+        (challenges_rewards, user_result), shop_data = await asyncio.gather(
+            claim_then_user_data(),
+            self.get_shop(query),
+        )
+        if not user_result.ok:
+            self.actions.set_due(ACTION_SYNC, self.get_retry_at())
+            return
+
+        self.actions.set_due(ACTION_SYNC, self.clock.server_now_ms() + settings.SYNC_INTERVAL * 1000)
+        user = user_result.data
+        user_name = user['initData']['first_name']
+        logger.info(f"<green>Пользователь:</green> <cyan>{user_name}</cyan>")
+        if challenges_rewards.ok:
+            logger.success(f"Награда за испытания успешно получена")
+        # Плановая сверка зеркала: ответ разбирается один раз, сырой словарь дальше не хранится
+        self.reconcile(user.get('player', {}))
+        resources = self.player.resources
+        constellations_last_index = self.player.constellations_last_index
+
+        resource_display = {
+            'gold': ('🪙', 'yellow'),
+            'gem': ('💎', 'cyan'),
+            'greenStones': ('🟢', 'green'),
+            'purpleStones': ('🟣', 'magenta'),
+            'orb': ('🔮', 'blue'),
+            'points': ('⭐', 'white'),
+            'gacha': ('🎉', 'red'),
+        }
+
+        # loguru разбирает разметку только в строке формата: цвета — в ней, значения — простые аргументы
+        amounts = dict(resources.items())
+        shown = [(emoji, color, amounts[resource]) for resource, (emoji, color) in resource_display.items()
+                 if resource in amounts]
+        lazy_logger.info("<yellow>Ресурсы:</yellow> " + " | ".join(
+            f"<{color}>{emoji} {{}}</{color}>" for emoji, color, _ in shown),
+            *(lambda amount=amount: f"{amount:,}" for _, _, amount in shown))
+
+        # Окно созвездий и клан зависят только от данных пользователя:
+        # запрашиваем их сразу, пока идут независимые записи
+        window_task = asyncio.create_task(self.load_constellation_window(query, constellations_last_index))
+        clan_task = asyncio.create_task(self.get_clan(query, self.player.clan_id))
+
+        logger.info(f"<yellow>Текущее время:</> <cyan>{format_server_time(self.clock.server_now_ms())} </>")
+
+        # Бесплатные гача и слот магазина — отдельные действия со своими сроками
+        self.schedule_free_gacha()
+        self.schedule_free_shop(shop_data)
+
+        self.enter_phase("rewards")
+        # Награды и повышение звёзд друг от друга не зависят
+        await asyncio.gather(
+            self.collect_gacha(query, resources.amount('gacha')),
+            self.collect_daily_reward(query, self.player.daily_reward_available),
+            self.star_up_heroes(query),
+        )
+
+        await self.play_challenges(query, window_task, clan_task)
+
+    async def check_challenges(self, query) -> None:
+        """
+        Действие «испытания»: вернулся герой или открылось испытание.
+        Решения принимаются по зеркалу, getUserData — только если оно устарело.
+        """
+        self.enter_phase("user")
+        await self.claim_challenges_rewards(query)
+        if not self.mirror.ready:
+            metrics.inc("player_refreshes")
+            if not await self.refresh_player(query):
+                self.actions.set_due(ACTION_CHALLENGES, self.get_retry_at())
+                return
+        else:
+            self.mirror.release_heroes(self.clock.server_now_ms())
+
+        window_task = asyncio.create_task(
+            self.load_constellation_window(query, self.player.constellations_last_index))
+        clan_task = asyncio.create_task(self.get_clan(query, self.player.clan_id))
+        await self.play_challenges(query, window_task, clan_task)
+
+    async def play_challenges(self, query, window_task: asyncio.Task, clan_task: asyncio.Task) -> None:
+        """
+        Прокачка, клан и отправка героев на испытания по текущему self.player.
+        window_task и clan_task запускаются заранее, чтобы их запросы шли
+        параллельно с другими действиями.
+        """
+        self.next_unlock_time = None
+        # Хоть один запрос не удался — часть работы не сделана, даже если ждать нечего
+        failed = False
+        resources = self.player.resources
+        constellations_last_index = self.player.constellations_last_index
+
+        self.enter_phase("constellations")
+        start_index, window_end, window = await window_task
+        if window is None:
+            clan_task.cancel()
+            self.actions.set_due(ACTION_CHALLENGES, self.get_retry_at())
+            return
+
+        # Получить минимальное количество звезд и минимальный уровень
+        current_constellation = self.constellation_cache.get(constellations_last_index)
+        min_stars = current_constellation.challenges[0].min_stars
+        min_level = current_constellation.challenges[0].min_level
+
+        self.enter_phase("level_up")
+        # Планируем прокачку всех героев за один проход и выполняем план
+        plans = plan_level_ups(self.player.heroes,
+                               gold=resources.amount('gold'),
+                               green=resources.amount('greenStones'),
+                               min_level=min_level, min_stars=min_stars)
+        if plans:
+            await self.run_level_up_plan(query, plans)
+
+        self.enter_phase("clan")
+        clan_info = await clan_task
+        if not clan_info.ok:
+            failed = True
+            logger.warning(f"❌ Не удалось получить данные для <red> Клана </red>. Пропускаем.")
+        else:
+            now_ms = self.clock.server_now_ms()
+            for hero in self.player.heroes:
+                if hero.unlock_at > now_ms and hero.hero_type == 'bonk' :
+                    formatted_time = format_duration((hero.unlock_at - now_ms) / 1000)
+                    logger.warning(
+                        f"⏳ Герой '<yellow>{hero.name}</>' ещё не разблокирован. "
+                        f"Разблокируется через <blue>{formatted_time}</blue>")
+                elif hero.unlock_at < now_ms and hero.hero_type == 'bonk' :
+                    for constellation in Constellation.from_list(clan_info.data.get("constellations", [])):
+                        challenges = constellation.challenges
                         logger.info(
-                            f"<yellow>Следующая награда магазина станет доступна в:</> <cyan>{next_shop_claim_time.strftime('%H:%M:%S')}</>")
-
-                    # Обрабатываем героев для улучшения звезд
-                    for hero in self.player.get('heroes', []):
-                        hero_type = hero['heroType']
-                        cost_star = hero['costStar']
-
-                        # Проверяем, достаточно ли карточек для улучшения звезд
-                        if hero_type in hero_card_dict and hero_card_dict[hero_type] >= cost_star and hero['unlockAt'] == 0:
-                            result = await self.star_up_hero(http_client, query, hero_type)
-                            if result['status'] == 'success':
-                                logger.success(f"Успешно повышены звёзды для <green> {hero_type}</>")
-                            else:
-                                logger.error(
-                                    f"<red>Не удалось повысить звёзды для {hero_type}. Ошибка: {result.get('error', 'Неизвестная ошибка')}</>")
-                    # Получить минимальное количество звезд и минимальный уровень
-                    get_constel = await self.get_constellations(http_client, query,
-                                                                start_index=constellations_last_index,
-                                                                amount=1)
-                    if get_constel["status"] != "success":
-                        return
-
-                    min_stars = get_constel["data"]['constellations'][0]['challenges'][0]['minStars']
-                    min_level = get_constel["data"]['constellations'][0]['challenges'][0]['minLevel']
-
-                    # Проверить каждого героя и вызвать функцию повышения уровня
-                    for hero in self.player.get('heroes', []):
-                        # Условие для улучшения героя
-                        if ((
-                                hero['stars'] >= min_stars + 1 and
-                                hero['rarity'] == 0 and
-                                hero['costLevelGold'] <= resources.get('gold', {}).get('amount', 0) and
-                                hero['costLevelGreen'] <= resources.get('greenStones', {}).get('amount',
-                                                                                               0) and
-                                hero['unlockAt'] == 0
-                        ) or (
-                                hero['stars'] >= min_stars and
-                                hero['rarity'] in [1, 2, 3] and
-                                hero['costLevelGold'] <= resources.get('gold', {}).get('amount', 0) and
-                                hero['costLevelGreen'] <= resources.get('greenStones', {}).get('amount',
-                                                                                               0) and
-                                hero['unlockAt'] == 0
-                        ) or (
-                                hero['stars'] >= min_stars and
-                                hero['rarity'] == 0 and
-                                hero['level'] >= min_level - 1 and
-                                hero['costLevelGold'] <= resources.get('gold', {}).get('amount', 0) and
-                                hero['costLevelGreen'] <= resources.get('greenStones', {}).get('amount',
-                                                                                               0) and
-                                hero['unlockAt'] == 0
-                        )):
-                            while (
-                                    hero['level'] < min_level
-                            ):
-                                hero_lvl_up = await self.lvl_up_hero(http_client, query,
-                                                                     hero_type=hero['heroType'])
-
-                                if hero_lvl_up and hero_lvl_up.get('status') == 'success':
-                                    heroes_from_response = hero_lvl_up.get('data', {})
-                                    if not heroes_from_response:
-                                        logger.error(
-                                            f"<red>Ответ API не содержит список героев: {hero_lvl_up}</>")
-                                        break
-
-                                    # Получаем новый уровень героя
-                                    new_level =  hero_lvl_up.get('data', {}).get('hero', {}).get('level')
-                                    spent_gold = hero_lvl_up.get('data', {}).get('spentGold')
-                                    self.current_gold = self.current_gold - spent_gold
-                                    logger.info(f"Текущее золото: {self.current_gold}")
-
-                                    if new_level is not None:
-                                        hero['level'] = new_level
+                            f"🧩 Найдено {len(challenges)} клановых испытаний в созвездии '{constellation.name}'.")
+
+                        for challenge in challenges:
+                            challenge_name = challenge.name
+
+                            if challenge.received < challenge.value * 0.9 :
+                                logger.debug(
+                                    "⚠️ Клановое Испытание '<yellow>{}</yellow>' не завершено. "
+                                    "Получено: <red>{}</red>, Необходимо: <green>{}</green>",
+                                    challenge_name, challenge.received, challenge.value)
+
+                                if challenge.unlock_at > now_ms:
+                                    formatted_time = format_duration((challenge.unlock_at - now_ms) / 1000)
+                                    logger.warning(
+                                        f"⏳ Испытание '<yellow>{challenge_name}</yellow>' ещё не разблокировано. "
+                                        f"Разблокируется через <blue>{formatted_time}</blue>")
+                                else:
+                                    sending = await self.send_to_clan_challenge(query, challenge.challenge_type)
+
+                                    if sending.ok:
                                         logger.success(
-                                            f"Успешно улучшен <green> {hero['heroType']} до Уровня {new_level}</>"
-                                        )
-                                        if new_level >= min_level:
-                                            break
+                                            f"✅ Герой <cyan>Bonk</cyan> успешно отправлен на клановое испытание<green> '{challenge_name}'</green>.")
+                                        break  # Завершаем метод после успешной отправки героя
                                     else:
-                                        logger.error(
-                                            f"<red>Не удалось получить новый уровень для {hero['heroType']}. "
-                                            f"Ответ API: {heroes_from_response}</>"
-                                        )
-                                        break
+                                        failed = True
+                                        logger.warning(
+                                            f"❌ Ошибка при отправке героя на клановое испытание '{challenge_name}'.")
+
+        logger.info(f"🚀 Начинаем обработку созвездий с индекса: <green>{start_index}</green>")
+
+        self.enter_phase("challenges")
+        constellations = self.constellation_cache.window(start_index, window_end)
+
+        if not constellations:
+            failed = True
+            logger.warning(
+                f"❌ Не удалось получить данные для индексов <red> от {start_index} до {constellations_last_index + 5} </red>. Пропускаем.")
+        else:
+            suitable_heroes = [
+                hero for hero in self.player.heroes
+                if hero.unlock_at == 0 and hero.hero_type != "bonk"
+            ]
+            logger.info(f"✅ Свободных героев: <magenta>{len(suitable_heroes)}</>")
+
+            now_ms = self.clock.server_now_ms()
+            suitable_challenges = [
+                challenge
+                for constellation in constellations
+                for challenge in constellation.challenges
+                if challenge.unlock_at < now_ms and challenge.received < challenge.value
+            ]
+
+            logger.info(f"✅ Доступных испытаний: <magenta>{len(suitable_challenges)}</>")
+
+            # Распределяем героев сразу по всем открытым испытаниям окна
+            assignments = assign_heroes(suitable_heroes, suitable_challenges)
+            hero_by_type = {hero.hero_type: hero for hero in suitable_heroes}
+
+            for constellation in constellations:
+                index = constellation.index
+                challenges = constellation.challenges
+                logger.info(
+                    f"🧩 Найдено {len(challenges)} испытаний в созвездии '{constellation.name}'.")
+
+                all_challenges_completed = True  # Флаг, показывающий, все ли испытания завершены
+
+                for challenge in challenges:
+                    challenge_name = challenge.name
+                    if challenge.received < challenge.value:
+                        logger.debug("⚠️ Испытание '<yellow>{}</yellow>' не завершено. "
+                                     "Получено: <red>{}</red>, Необходимо: <green>{}</green>",
+                                     challenge_name, challenge.received, challenge.value)
+
+                        if challenge.unlock_at > now_ms:
+                            formatted_time = format_duration((challenge.unlock_at - now_ms) / 1000)
+                            logger.warning(
+                                f"⏳ Испытание '<yellow>{challenge_name}</yellow>' ещё не разблокировано. "
+                                f"Разблокируется через <blue>{formatted_time}</blue>")
+                            all_challenges_completed = False
+                            continue
+                        else:
+                            heroes_for_slots = assignments.get(challenge.challenge_type, [])
+                            for assigned in heroes_for_slots:
+                                hero = hero_by_type[assigned["heroType"]]
+                                logger.info(
+                                    f"🟢 Герой '{hero.hero_type}' назначен на слот {assigned['slotId']} '{hero.hero_class}'. "
+                                    f"Уровень: {hero.level}, Звёзды: {hero.stars}"
+                                )
+
+                            # Отправка героев, если они есть
+                            if heroes_for_slots:
+                                sending = await self.send_to_challenge(
+                                    query,
+                                    challenge.challenge_type,
+                                    heroes=heroes_for_slots
+                                )
+                                if sending.ok:
+                                    logger.success(
+                                        f"✅ Герои {len(heroes_for_slots)} успешно отправлены на испытание<green> '{challenge_name}'</>.")
+                                    self.constellation_cache.apply_send(
+                                        challenge.challenge_type, heroes_for_slots,
+                                        Constellation.from_list(sending.data.get("constellations", [])),
+                                        self.player.heroes)
                                 else:
-                                    logger.error(
-                                        f"<red>Не удалось улучшить {hero['heroType']}. "
-                                        f"Ошибка: {hero_lvl_up.get('error', 'Неизвестная ошибка')}</>"
-                                    )
-                                    break
-
-                                await asyncio.sleep(delay=random.randint(2, 5))
-
-                    # Получение информации о клане
-                    await asyncio.sleep(delay=random.randint(2, 5))
-                    clan_info = await self.get_clan(http_client, query, clan_id)
-                    if clan_info.get("status") != "success":
-                        logger.warning(f"❌ Не удалось получить данные для <red> Клана </red>. Пропускаем.")
-                    else:
-                        for hero in self.player.get('heroes', []):
-                            if hero["unlockAt"] > int(time() * 1000) and hero['heroType'] == 'bonk' :
-                                unlock_time = datetime.fromtimestamp(hero['unlockAt'] / 1000,
-                                                                     tz=pytz.utc).astimezone(wib)
-                                time_difference = unlock_time - current_time
-                                formatted_time = format_duration(time_difference.total_seconds())
+                                    failed = True
+                                    logger.warning(
+                                        f"❌ Ошибка при отправке героев на испытание '{challenge_name}'.")
+                            else:
                                 logger.warning(
-                                    f"⏳ Герой '<yellow>{hero['name']}</>' ещё не разблокирован. "
-                                    f"Разблокируется через <blue>{formatted_time}</blue>")
-                            elif hero["unlockAt"] < int(time() * 1000) and hero['heroType'] == 'bonk' :
-                                for constellation in clan_info.get("data", {}).get("constellations", []):
-                                    challenges = constellation.get("challenges", [])
-                                    logger.info(
-                                        f"🧩 Найдено {len(challenges)} клановых испытаний в созвездии '{constellation.get('name')}'.")
-
-                                    for challenge in challenges:
-                                        challenge_name = challenge.get("name")
-
-                                        if challenge["received"] < challenge["value"] * 0.9 :
-                                            logger.info(
-                                                f"⚠️ Клановое Испытание '<yellow>{challenge_name}</yellow>' не завершено. "
-                                                f"Получено: <red>{challenge['received']}</red>, Необходимо: <green>{challenge['value']}</green>")
-
-                                            if challenge["unlockAt"] > int(time() * 1000):
-                                                unlock_time = datetime.fromtimestamp(challenge['unlockAt'] / 1000,
-                                                                                     tz=pytz.utc).astimezone(wib)
-                                                time_difference = unlock_time - current_time
-                                                formatted_time = format_duration(time_difference.total_seconds())
-                                                logger.warning(
-                                                    f"⏳ Испытание '<yellow>{challenge_name}</yellow>' ещё не разблокировано. "
-                                                    f"Разблокируется через <blue>{formatted_time}</blue>")
-                                            else:
-                                                sending = await self.send_to_clan_challenge(http_client, query,
-                                                                                            challenge["challengeType"])
-
-                                                if sending and sending["status"] == "success":
-                                                    logger.success(
-                                                        f"✅ Герой <cyan>Bonk</cyan> успешно отправлен на клановое испытание<green> '{challenge_name}'</green>.")
-                                                    self.player = sending.get('data', {}).get('player', {})
-                                                    break  # Завершаем метод после успешной отправки героя
-                                                else:
-                                                    logger.warning(
-                                                        f"❌ Ошибка при отправке героя на клановое испытание '{challenge_name}'.")
-
-                    # Получаем стартовый индекс для конкретного аккаунта (из файла или через поиск)
-                    start_index = self.load_min_index()  # Передаем self.session_name
-                    logger.info(
-                        f"📂 Загружен стартовый индекс для аккаунта {user_name} из файла: <cyan>{start_index}</cyan>")
+                                    f"⚠️ Недостаточно подходящих героев для испытания '{challenge_name}'.")
 
-                    if start_index is None or start_index > constellations_last_index:
-                        logger.info("<yellow>🔄 Запуск поиска актуального стартового индекса...</yellow>")
-                        start_index = await self.find_start_index(http_client, query, constellations_last_index)
+                            # Если хотя бы одно испытание не завершено, обновляем стартовый индекс
+                            all_challenges_completed = False
+                # Если все испытания для текущего индекса завершены, обновляем минимальный индекс
+                if all_challenges_completed and start_index == index:
+                    start_index = index + 1
+                    logger.info(
+                        f"🔄 Все испытания для индекса {index} завершены. Обновляем минимальный индекс для аккаунта {self.session_name} на {start_index}")
+                    self.save_min_index(start_index)
+                    logger.info(
+                        f"💾 Новый стартовый индекс для аккаунта {self.session_name} сохранён: <green>{start_index}</green>")
+
+        logger.info("<blue>🏁 Обработка созвездий завершена.</blue>")
+
+        # Проверяем время разблокировки героев
+        now_ms = self.clock.server_now_ms()
+        for hero in self.player.heroes:
+            if hero.unlock_at > now_ms:  # unlockAt == 0 — герой свободен
+                if self.next_unlock_time is None or self.next_unlock_time > hero.unlock_at:
+                    self.next_unlock_time = hero.unlock_at
+        if self.next_unlock_time is not None:
+            # Возвращение героев меняет прогресс испытаний — окно к этому моменту устаревает
+            self.constellation_cache.expire_at(self.next_unlock_time)
+
+        next_challenge_unlock = self.constellation_cache.next_unlock_at(now_ms)
+        if next_challenge_unlock is not None:
+            if self.next_unlock_time is None or self.next_unlock_time > next_challenge_unlock:
+                self.next_unlock_time = next_challenge_unlock
+
+        # Следующий раз испытания нужны, когда вернётся герой или откроется испытание;
+        # None — только если ждать действительно нечего
+        due_at = self.next_unlock_time
+        if failed:
+            due_at = min(due_at, self.get_retry_at()) if due_at is not None else self.get_retry_at()
+        self.actions.set_due(ACTION_CHALLENGES, due_at)
+
+    def get_start_delay(self) -> int:
+        if settings.USE_RANDOM_DELAY_IN_RUN:
+            random_delay = random.randint(settings.RANDOM_DELAY_IN_RUN[0], settings.RANDOM_DELAY_IN_RUN[1])
+            logger.info(f"{self.session_name} | Bot will start in <ly>{random_delay}s</ly>")
+            return random_delay
+        return 0
 
-                    logger.info(f"🚀 Начинаем обработку созвездий с индекса: <green>{start_index}</green>")
+    async def run(self) -> float | None:
+        """
+        Одно пробуждение аккаунта: выполняет созревшие действия. Возвращает время
+        следующего запуска (unix-время, сек) или None, если аккаунт нужно снять
+        с планировщика.
+        """
+        if self.wake_at is not None:
+            early_ms = self.wake_at - self.clock.server_now_ms()
+            if early_ms > settings.EARLY_WAKEUP_TOLERANCE * 1000:
+                # Оценка смещения часов уточнилась, пока аккаунт ждал, — цикл сейчас ничего не даст
+                metrics.inc("early_wakeups")
+                metrics.inc("early_wakeup_seconds", early_ms / 1000)
+                logger.debug(f"Woke up {early_ms / 1000:.1f}s early, sleeping until {format_server_time(self.wake_at)}")
+                return self.clock.to_local(self.wake_at)
+            self.wake_at = self.wake_deadline = None
 
-                    constellations = await self.get_constellations(
-                        http_client,
-                        query,
-                        start_index=start_index,
-                        amount=(constellations_last_index - start_index + 5)
-                    )
+        try:
+            self.enter_phase("login")
+            if self.login_need or not self.has_valid_auth():
+                await self.login()
 
-                    if constellations.get("status") != "success":
-                        logger.warning(
-                            f"❌ Не удалось получить данные для индексов <red> от {start_index} до {constellations_last_index + 5} </red>. Пропускаем.")
-                    else:
-                        suitable_heroes = [
-                            hero for hero in self.player.get("heroes", [])
-                            if hero["unlockAt"] == 0 and
-                               hero["heroType"] != "bonk" and
-                               hero["level"] >= constellations["data"]['constellations'][0]['challenges'][0][
-                                   'minLevel'] and
-                               hero["stars"] >= constellations["data"]['constellations'][0]['challenges'][0]['minStars']
-                        ]
-                        suitable_heroes.sort(key=lambda x: x.get("power", 0), reverse=True)
-                        logger.info(f"✅ Подходящих героев: <magenta>{len(suitable_heroes)}</>")
-
-                        suitable_challenges = []
-                        for constellation in constellations.get("data", {}).get("constellations", []):
-                            challenges = constellation.get("challenges", [])
-                            for challenge in challenges:
-                                if challenge["unlockAt"] < int(time() * 1000) and challenge["received"] < challenge[
-                                    "value"]:
-                                    suitable_challenges.append(challenge)
-
-                        logger.info(f"✅ Доступных испытаний: <magenta>{len(suitable_challenges)}</>")
-
-                        for constellation in constellations["data"]["constellations"]:
-                            index = constellation.get("index")
-                            challenges = constellation.get("challenges", [])
-                            logger.info(
-                                f"🧩 Найдено {len(challenges)} испытаний в созвездии '{constellation.get('name')}'.")
-
-                            all_challenges_completed = True  # Флаг, показывающий, все ли испытания завершены
-
-                            for challenge in challenges:
-                                challenge_name = challenge.get("name")
-                                if challenge["received"] < challenge["value"]:
-                                    logger.info(f"⚠️ Испытание '<yellow>{challenge_name}</yellow>' не завершено. "
-                                                f"Получено: <red>{challenge['received']}</red>, Необходимо: <green>{challenge['value']}</green>")
-
-                                    if challenge["unlockAt"] > int(time() * 1000):
-                                        unlock_time = datetime.fromtimestamp(challenge['unlockAt'] / 1000,
-                                                                             tz=pytz.utc).astimezone(wib)
-                                        time_difference = unlock_time - current_time
-                                        formatted_time = format_duration(time_difference.total_seconds())
-                                        logger.warning(
-                                            f"⏳ Испытание '<yellow>{challenge_name}</yellow>' ещё не разблокировано. "
-                                            f"Разблокируется через <blue>{formatted_time}</blue>")
-                                        all_challenges_completed = False
-                                        continue
-                                    else:
-                                        slots = [slot for slot in challenge.get("orderedSlots", []) if
-                                                 slot["unlocked"] and slot["occupiedBy"] == "empty"]
-                                        min_level = challenge["minLevel"]
-                                        min_stars = challenge["minStars"]
-                                        # Проверка наличия героев
-                                        if not suitable_heroes:
-                                            logger.warning(
-                                                f"⚠️ Нет доступных героев для испытания '{challenge_name}'. Пропускаем.")
-                                            continue
-
-                                        # Устанавливаем множитель для испытания с resourceType == "points"
-                                        if challenge.get("resourceType") == "points":
-                                            multiplier = 9
-                                        elif challenge.get("resourceType") == "gacha":
-                                            multiplier = 1
-                                        else:
-                                            # В остальных случаях динамически вычисляем множитель
-                                            multiplier = max(1, len(suitable_heroes) // len(suitable_challenges) if len(
-                                                suitable_challenges) else 1)
-
-                                        heroes_for_slots = []
-
-                                        # Пытаемся заполнить `multiplier` слотов подходящими героями
-                                        filled_slots_count = 0  # Счётчик успешно заполненных слотов
-                                        # Инициализируем список для хранения занятых слотов
-                                        occupied_slots = []
-                                        # Присваиваем слот Id, если его нет
-                                        for idx, slot in enumerate(slots):
-                                            if 'slotId' not in slot:
-                                                slot["slotId"] = idx
-                                                # Далее обработка слотов
-                                        for slot in slots:
-                                            if filled_slots_count >= multiplier:
-                                                break  # Прекращаем, если заполнили нужное количество слотов
-
-                                            for hero in suitable_heroes:
-                                                # Теперь можно безопасно использовать 'slotId'
-                                                if slot["slotId"] in occupied_slots:
-                                                    continue  # Пропускаем, если слот уже занят
-
-                                                # Проверяем, если герой подходит по классу и уровням
-                                                if (hero["class"] == slot["heroClass"] and
-                                                        hero["stars"] >= min_stars and
-                                                        hero["level"] >= min_level and
-                                                        hero["unlockAt"] == 0):
-                                                    logger.info(
-                                                        f"🟢 Герой '{hero['heroType']}' назначен на слот '{slot['heroClass']}'. "
-                                                        f"Уровень: {hero['level']}, Звёзды: {hero['stars']}"
-                                                    )
-                                                    heroes_for_slots.append({
-                                                        "slotId": slot["slotId"],  # Используем слот Id
-                                                        "heroType": hero["heroType"]
-                                                    })
-                                                    occupied_slots.append(
-                                                        slot["slotId"])  # Добавляем слот в список занятых
-                                                    hero["unlockAt"] = int(time() * 1000)  # Блокируем героя временно
-                                                    filled_slots_count += 1
-                                                    break  # Переходим к следующему слоту после успешного назначения героя
-
-                                        # Отправка героев, если они есть
-                                        if heroes_for_slots:
-                                            sending = await self.send_to_challenge(
-                                                http_client,
-                                                query,
-                                                challenge["challengeType"],
-                                                heroes=heroes_for_slots
-                                            )
-                                            # Если отправка не удалась, откатываем изменения
-                                            if not sending or sending["status"] != "success":
-                                                logger.warning(f"❌ Ошибка при отправке героев. Откатываем изменения.")
-                                                for hero in heroes_for_slots:
-                                                    # Восстанавливаем unlockAt обратно в 0
-                                                    hero_type = hero["heroType"]
-                                                    for suitable_hero in suitable_heroes:
-                                                        if suitable_hero["heroType"] == hero_type:
-                                                            suitable_hero["unlockAt"] = 0  # Откатываем блокировку героя
-                                                            break
-
-                                            if sending and sending["status"] == "success":
-                                                logger.success(
-                                                    f"✅ Герои {len(heroes_for_slots)} успешно отправлены на испытание<green> '{challenge_name}'</>.")
-                                                self.player = sending.get('data', {}).get('player', {})
-                                            else:
-                                                logger.warning(
-                                                    f"❌ Ошибка при отправке героев на испытание '{challenge_name}'.")
-                                        else:
-                                            logger.warning(
-                                                f"⚠️ Недостаточно подходящих героев для испытания '{challenge_name}'.")
-
-                                        # Если хотя бы одно испытание не завершено, обновляем стартовый индекс
-                                        all_challenges_completed = False
-                            # Если все испытания для текущего индекса завершены, обновляем минимальный индекс
-                            if all_challenges_completed and start_index == index:
-                                start_index = index + 1
-                                logger.info(
-                                    f"🔄 Все испытания для индекса {index} завершены. Обновляем минимальный индекс для аккаунта {self.session_name} на {start_index}")
-                                self.save_min_index(start_index)
-                                logger.info(
-                                    f"💾 Новый стартовый индекс для аккаунта {self.session_name} сохранён: <green>{start_index}</green>")
-
-                    logger.info("<blue>🏁 Обработка созвездий завершена.</blue>")
-
-                    # Проверяем время разблокировки героев
-                    for hero in self.player.get("heroes", []):
-                        if hero["unlockAt"] != 0 and hero["unlockAt"] > int(
-                                time() * 1000):  # Игнорируем, если unlockAt равно 0
-                            unlock_time = datetime.fromtimestamp(hero["unlockAt"] / 1000, tz=pytz.utc)
-                            if self.next_unlock_time is None or self.next_unlock_time > unlock_time:
-                                self.next_unlock_time = unlock_time.astimezone(wib)
-                    constellations = await self.get_constellations(
-                        http_client,
-                        query,
-                        start_index=start_index,
-                        amount=(constellations_last_index - start_index + 5)
-                    )
-                    if constellations:
-                        for constellation in constellations.get("data", {}).get("constellations", []):
-                            challenges = constellation.get("challenges", [])
-                            for challenge in challenges:
-                                if challenge["unlockAt"] != 0 and challenge["unlockAt"] > int(time() * 1000):
-                                    unlock_time = datetime.fromtimestamp(challenge["unlockAt"] / 1000, tz=pytz.utc)
-                                    if self.next_unlock_time is None or self.next_unlock_time > unlock_time:
-                                        self.next_unlock_time = unlock_time.astimezone(wib)
-
-                    if self.next_unlock_time is not None:
-                        next_time = min(next_gacha_claim_time, next_shop_claim_time, self.next_unlock_time)
-                    else:
-                        next_time = min(next_gacha_claim_time, next_shop_claim_time)
-
-                    wait_time = (next_time - current_time).total_seconds()
-                    self.wait_time = wait_time
-
-                    if self.socket is not None:
-                        try:
-                            await self.socket.close()
-                        except Exception as error:
-                            logger.warning(
-                                f"Unknown error during closing socket: <light-yellow>{error}</light-yellow>")
+            if not self.has_valid_auth():
+                if not self.active:
+                    return None
+                if self.tries_to_login > 0:
+                    self.tries_to_login -= 1
+                    logger.info(f"Login request not always successful, retrying..")
+                    return time() + random.randint(10, 40)
+                return None
 
-                    while self.wait_time > 0:
-                        formatted_time = format_duration(int(self.wait_time))
-                        sys.stdout.write(
-                            f"\r\033[96m[ Ждём: \033[0m\033[97m {formatted_time} \033[0m\033[96m... ]\033[0m"
-                        )
-                        sys.stdout.flush()
-                        await asyncio.sleep(1)
-                        self.wait_time -= 1
+        except Exception as error:
+            if self.check_timeout_error(error) or self.check_error(error, "Service Unavailable"):
+                logger.warning(f"Warning during login: <magenta>Sleepagotchi</magenta> server is not responding.")
+                if self.tries_to_login > 0:
+                    self.tries_to_login -= 1
+                    logger.info(f"Login request not always successful, retrying..")
+                    return time() + random.randint(10, 40)
+                return None
+            else:
+                logger.error(f"Unknown error during login: <light-yellow>{error}</light-yellow>")
+                self.status.record_error(error)
+                return None
 
+        try:
+            query = self.tg_web_data
+            # Каждое созревшее действие выполняется один раз за пробуждение;
+            # синхронизация может назначить другим действиям срок «сейчас»
+            done = set()
+            while True:
+                now_ms = self.clock.server_now_ms()
+                action = next((action for action in self.actions.due(now_ms) if action.name not in done), None)
+                if action is None:
+                    break
 
-            except Exception as error:
-                logger.error(f"Unknown error: <light-yellow>{error}</light-yellow>")
-                await asyncio.sleep(delay=random.randint(5, 10))
+                done.add(action.name)
+                metrics.inc(f"{action.name}_actions")
+                self.enter_phase(action.name)
+                await action.func(query)
+                if action.due_at is not None and action.due_at <= now_ms:
+                    # Сервер не сдвинул срок — повторим позже, а не сразу
+                    action.due_at = self.get_retry_at()
+
+            next_action = self.actions.next_due()
+            next_time = next_action.due_at
+            self.wake_at = next_time
+            self.wake_deadline = self.clock.deadline(next_time)
+            wait_time = remaining(self.wake_deadline)
+            self.wait_time = wait_time
+
+            if self.socket is not None:
+                try:
+                    await self.socket.close()
+                except Exception as error:
+                    logger.warning(
+                        f"Unknown error during closing socket: <light-yellow>{error}</light-yellow>")
 
+            logger.info(f"<cyan>Следующее действие ({next_action.name}) через:</cyan> "
+                        f"{format_duration(max(wait_time, 0))} ({format_server_time(next_time)})")
+            return self.clock.to_local(next_time)
 
-async def run_tapper(tg_client: Client):
+        except Exception as error:
+            logger.error(f"Unknown error: <light-yellow>{error}</light-yellow>")
+            self.status.record_error(error)
+            return time() + random.randint(5, 10)
+
+
+async def run_tapper(tapper: Tapper) -> float | None:
+    set_session(tapper.session_name)
+    breaker = get_circuit_breaker() if settings.CIRCUIT_ENABLED else None
+    if breaker is not None and breaker.is_open:
+        # Сервер недоступен — цикл не начинаем и ждём в планировщике
+        metrics.inc("circuit_parked_cycles")
+        next_run = breaker.parked_until()
+        tapper.status.finish_cycle(next_run)
+        return next_run
+
+    tapper.status.start_cycle()
     try:
-        await Tapper(tg_client=tg_client).run()
+        next_run = await tapper.run()
     except InvalidSession:
-        logger.error(f"{tg_client.name} | Invalid Session")
+        logger.error(f"{tapper.session_name} | Invalid Session")
+        tapper.status.record_error("Invalid Session")
+        next_run = None
+    tapper.enter_phase(None)
+
+    if next_run is not None and breaker is not None and not breaker.is_closed:
+        next_run = max(next_run, breaker.parked_until())
+    if next_run is None:
+        tapper.active = False
+    tapper.status.finish_cycle(next_run)
+    return next_run
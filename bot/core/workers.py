@@ -0,0 +1,188 @@
+"""
+Запуск сессий в нескольких процессах.
+
+Сессии раскладываются по воркерам по crc32 имени, поэтому при том же числе
+воркеров сессия всегда попадает в один и тот же процесс и её состояние
+пишет только он. Каждый воркер — отдельный процесс со своим циклом событий;
+супервизор перезапускает упавшие воркеры и собирает их статус и счётчики.
+"""
+import asyncio
+import multiprocessing
+import queue
+import zlib
+from collections import Counter
+from time import time
+
+from bot.config import settings
+from bot.core.api import EndpointStats, endpoint_stats
+from bot.core.metrics import dump_metrics, merge_metrics
+from bot.utils import logger
+from bot.utils.dashboard import AccountStatus, status_board
+from bot.utils.logger import add_sink, stdout_sink
+
+EVENT_LOG = "log"
+EVENT_STATUS = "status"
+
+
+def get_worker_index(session_name: str, workers: int) -> int:
+    return zlib.crc32(session_name.encode()) % workers
+
+
+def shard_sessions(session_names: list[str], workers: int) -> list[list[str]]:
+    shards = [[] for _ in range(workers)]
+    for session_name in session_names:
+        shards[get_worker_index(session_name, workers)].append(session_name)
+    return shards
+
+
+def dump_endpoint_stats() -> dict[str, dict]:
+    return {endpoint: {field: getattr(stats, field) for field in EndpointStats.__slots__}
+            for endpoint, stats in endpoint_stats.items()}
+
+
+def merge_endpoint_stats(snapshots: list[dict[str, dict]]) -> None:
+    """
+    Пересобирает endpoint_stats супервизора из снимков воркеров.
+    """
+    endpoint_stats.clear()
+    for snapshot in snapshots:
+        for endpoint, values in snapshot.items():
+            stats = endpoint_stats.get(endpoint)
+            if stats is None:
+                stats = endpoint_stats[endpoint] = EndpointStats()
+            for field, value in values.items():
+                if field == "latency_max":
+                    stats.latency_max = max(stats.latency_max, value)
+                elif field == "latency_counts":
+                    stats.latency_counts = [total + count for total, count in zip(stats.latency_counts, value)]
+                else:
+                    setattr(stats, field, getattr(stats, field) + value)
+
+
+class WorkerReporter:
+    """
+    Сторона воркера: периодически отправляет супервизору статус аккаунтов и
+    счётчики эндпоинтов, а в режиме dashboard ещё и строки лога.
+    """
+
+    def __init__(self, index: int, events):
+        self.index = index
+        self.events = events
+
+    def log_sink(self, message) -> None:
+        self.events.put((EVENT_LOG, self.index, str(message).rstrip("\n")))
+
+    def attach(self) -> None:
+        logger.remove(stdout_sink)
+        add_sink(self.log_sink, colorize=False, format="{time:HH:mm:ss} | {level: <8} | {message}")
+
+    def snapshot(self) -> dict:
+        return {
+            "accounts": {session_name: {field: getattr(status, field) for field in AccountStatus.__slots__}
+                         for session_name, status in status_board.accounts.items()},
+            "endpoints": dump_endpoint_stats(),
+            "metrics": dump_metrics(),
+        }
+
+    async def run(self, interval: float) -> None:
+        while True:
+            self.events.put((EVENT_STATUS, self.index, self.snapshot()))
+            await asyncio.sleep(interval)
+
+
+class Supervisor:
+    """
+    Держит по процессу на непустой шард. Воркер, завершившийся с ошибкой,
+    перезапускается с экспоненциальной задержкой; штатно завершившийся
+    (все его аккаунты сняты с планировщика) больше не запускается.
+    target(index, session_names, events) — точка входа процесса воркера.
+    """
+
+    def __init__(self, shards: list[list[str]], target):
+        self.shards = shards
+        self.target = target
+        self.context = multiprocessing.get_context("spawn")
+        self.events = self.context.Queue()
+        self.processes = {}
+        self.restarts = Counter()
+        self.restart_at = {}
+        self.worker_endpoints = {}
+        self.worker_metrics = {}
+        self.retired_endpoints = []
+        self.retired_metrics = []
+
+    def start_worker(self, index: int) -> None:
+        process = self.context.Process(target=self.target, args=(index, self.shards[index], self.events),
+                                       name=f"worker-{index}", daemon=True)
+        process.start()
+        self.processes[index] = process
+        logger.info(f"Worker <ly>{index}</ly> started with <ly>{len(self.shards[index])}</ly> sessions "
+                    f"(pid {process.pid})")
+
+    def check_workers(self) -> None:
+        now = time()
+
+        for index, process in list(self.processes.items()):
+            if process.is_alive() or index in self.restart_at:
+                continue
+
+            # Счётчики упавшего воркера не должны пропадать из суммы
+            if index in self.worker_endpoints:
+                self.retired_endpoints.append(self.worker_endpoints.pop(index))
+            if index in self.worker_metrics:
+                snapshot = self.worker_metrics.pop(index)
+                # Датчики описывают живой процесс и в сумму не переносятся
+                self.retired_metrics.append({**snapshot, "gauges": {}})
+
+            if process.exitcode == 0:
+                logger.info(f"Worker <ly>{index}</ly> finished")
+                del self.processes[index]
+                continue
+
+            self.restarts[index] += 1
+            delay = min(settings.WORKER_RESTART_DELAY * 2 ** (self.restarts[index] - 1), 300)
+            self.restart_at[index] = now + delay
+            logger.warning(f"Worker <ly>{index}</ly> exited with code {process.exitcode}, "
+                           f"restarting in {delay:.0f}s")
+
+        for index, restart_at in list(self.restart_at.items()):
+            if restart_at <= now:
+                del self.restart_at[index]
+                self.start_worker(index)
+
+    def drain_events(self) -> None:
+        while True:
+            try:
+                kind, index, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == EVENT_LOG:
+                status_board.log_sink(payload)
+            elif kind == EVENT_STATUS:
+                for session_name, fields in payload["accounts"].items():
+                    status = status_board.get(session_name)
+                    for field, value in fields.items():
+                        setattr(status, field, value)
+                self.worker_endpoints[index] = payload["endpoints"]
+                self.worker_metrics[index] = payload["metrics"]
+
+        merge_endpoint_stats([*self.retired_endpoints, *self.worker_endpoints.values()])
+        merge_metrics([*self.retired_metrics, *self.worker_metrics.values()])
+
+    async def run(self) -> None:
+        for index, shard in enumerate(self.shards):
+            if shard:
+                self.start_worker(index)
+
+        try:
+            while self.processes:
+                self.drain_events()
+                self.check_workers()
+                await asyncio.sleep(settings.WORKER_STATUS_INTERVAL)
+        finally:
+            for process in self.processes.values():
+                if process.is_alive():
+                    process.terminate()
+            for process in self.processes.values():
+                process.join(timeout=5)
@@ -0,0 +1,114 @@
+import asyncio
+import shutil
+import sys
+from collections import deque
+from datetime import datetime
+from time import time
+
+from bot.core.clock import display_timezone
+from bot.core.helper import format_duration
+from bot.utils import logger
+from bot.utils.logger import add_sink, stdout_sink
+
+STATE_WAITING = "waiting"
+STATE_RUNNING = "running"
+STATE_STOPPED = "stopped"
+
+
+class AccountStatus:
+    __slots__ = ("session_name", "state", "next_wake", "cycle_started", "last_cycle", "errors", "last_error")
+
+    def __init__(self, session_name: str):
+        self.session_name = session_name
+        self.state = STATE_WAITING
+        self.next_wake = None
+        self.cycle_started = None
+        self.last_cycle = None
+        self.errors = 0
+        self.last_error = ""
+
+    def start_cycle(self) -> None:
+        self.state = STATE_RUNNING
+        self.cycle_started = time()
+
+    def finish_cycle(self, next_wake: float | None) -> None:
+        if self.cycle_started is not None:
+            self.last_cycle = time() - self.cycle_started
+        self.cycle_started = None
+        self.next_wake = next_wake
+        self.state = STATE_WAITING if next_wake is not None else STATE_STOPPED
+
+    def record_error(self, error) -> None:
+        self.errors += 1
+        self.last_error = str(error)
+
+
+class StatusBoard:
+    """
+    Сводное состояние всех аккаунтов. Аккаунты только обновляют свои поля,
+    вывод делает один рендерер с фиксированной частотой.
+    """
+
+    def __init__(self):
+        self.accounts = {}
+        self.log_tail = deque(maxlen=200)
+
+    def get(self, session_name: str) -> AccountStatus:
+        status = self.accounts.get(session_name)
+        if status is None:
+            status = self.accounts[session_name] = AccountStatus(session_name)
+        return status
+
+    def log_sink(self, message) -> None:
+        self.log_tail.append(str(message).rstrip("\n"))
+
+    def attach(self) -> None:
+        """
+        Переводит вывод логов со stdout в хвост под таблицей.
+        """
+        logger.remove(stdout_sink)
+        add_sink(self.log_sink, colorize=False, format="{time:HH:mm:ss} | {level: <8} | {message}")
+
+    def render(self) -> str:
+        width, height = shutil.get_terminal_size((120, 40))
+        now = time()
+
+        counts = {STATE_RUNNING: 0, STATE_WAITING: 0, STATE_STOPPED: 0}
+        for status in self.accounts.values():
+            counts[status.state] += 1
+        errors = sum(status.errors for status in self.accounts.values())
+
+        lines = [
+            f"Sleepagotchi | accounts: {len(self.accounts)} | running: {counts[STATE_RUNNING]} "
+            f"| waiting: {counts[STATE_WAITING]} | stopped: {counts[STATE_STOPPED]} | errors: {errors}"
+            f" | {datetime.now(tz=display_timezone).strftime('%H:%M:%S')}",
+            f"{'Account':<24} {'State':<8} {'Next wake':<10} {'In':>9} {'Cycle':>7} {'Err':>4}  Last error",
+        ]
+
+        # Сначала работающие, затем по времени пробуждения
+        rows = sorted(self.accounts.values(),
+                      key=lambda status: (status.state != STATE_RUNNING, status.next_wake or float("inf")))
+        log_lines = max(5, height // 3)
+        for status in rows[:max(height - len(lines) - log_lines - 2, 1)]:
+            if status.next_wake is not None:
+                next_wake = datetime.fromtimestamp(status.next_wake, tz=display_timezone).strftime('%H:%M:%S')
+                wake_in = format_duration(max(status.next_wake - now, 0))
+            else:
+                next_wake = wake_in = "-"
+            cycle = f"{status.last_cycle:.1f}s" if status.last_cycle is not None else "-"
+            lines.append(f"{status.session_name[:24]:<24} {status.state:<8} {next_wake:<10} {wake_in:>9} "
+                         f"{cycle:>7} {status.errors:>4}  {status.last_error}")
+
+        lines.append("-" * min(width, 120))
+        lines.extend(list(self.log_tail)[-log_lines:])
+
+        return "\n".join(line[:width] for line in lines)
+
+    async def run_renderer(self, interval: float) -> None:
+        while True:
+            sys.stdout.write("\033[H\033[2J" + self.render() + "\n")
+            sys.stdout.flush()
+            await asyncio.sleep(interval)
+
+
+status_board = StatusBoard()
@@ -1,12 +1,24 @@
-import os
-import glob
 import asyncio
 import argparse
-from pyrogram import Client
+from contextlib import suppress
+from functools import partial
+from time import perf_counter, time
 from bot.config import settings
 from bot.utils import logger
-from bot.core.tapper import run_tapper
-from bot.core.registrator import register_sessions
+from bot.core.connections import TelegramClientManager, preload_pyrogram
+from bot.core.http_client import close_http_client, preload_http_client
+from bot.core.preflight import check_sessions
+from bot.core.circuit_breaker import get_circuit_breaker
+from bot.core.rate_limiter import get_rate_limiter
+from bot.core.replay import close_api_archive
+from bot.core import metrics
+from bot.core.scheduler import Scheduler
+from bot.core.state_store import get_state_store, close_state_store
+from bot.core.tapper import Tapper, run_tapper
+from bot.core.workers import Supervisor, WorkerReporter, shard_sessions
+from bot.utils.dashboard import status_board
+from bot.utils.logger import run_log_flusher, shutdown_logger
+from bot.utils.sessions import get_session_names
 
 start_text = """
    ▄████████  ▄█          ▄████████    ▄████████    ▄███████▄    ▄████████
@@ -34,21 +46,7 @@ Select an action:
 
 """
 
-global tg_clients
-
-
-def get_session_names() -> list[str]:
-    session_names = sorted(glob.glob("sessions/*.session"))
-    session_names = [
-        os.path.splitext(os.path.basename(file))[0] for file in session_names
-    ]
-
-    return session_names
-
-
-async def get_tg_clients() -> list[Client]:
-    global tg_clients
-
+def get_tg_clients() -> TelegramClientManager:
     session_names = get_session_names()
 
     if not session_names:
@@ -57,27 +55,18 @@ async def get_tg_clients() -> list[Client]:
     if not settings.API_ID or not settings.API_HASH:
         raise ValueError("API_ID and API_HASH not found in the .env file.")
 
-    tg_clients = [
-        Client(
-            name=session_name,
-            api_id=settings.API_ID,
-            api_hash=settings.API_HASH,
-            workdir="sessions/",
-            plugins=dict(root="bot/plugins"),
-        )
-        for session_name in session_names
-    ]
-
-    return tg_clients
+    return TelegramClientManager(session_names)
 
 
 async def process() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("-a", "--action", type=int, help="Action to perform")
+    parser.add_argument("-w", "--workers", type=int, default=settings.WORKERS, help="Number of worker processes")
 
     logger.info(f"Detected {len(get_session_names())} sessions")
 
-    action = parser.parse_args().action
+    args = parser.parse_args()
+    action = args.action
 
     if not action:
         print(start_text)
@@ -94,23 +83,119 @@ async def process() -> None:
                 break
 
     if action == 1:
-        tg_clients = await get_tg_clients()
+        tg_clients = get_tg_clients()
+
+        if settings.SESSION_CHECK_ENABLED:
+            tg_clients.session_names = await check_sessions(tg_clients)
+            if not tg_clients.session_names:
+                await tg_clients.close()
+                raise FileNotFoundError("No working sessions")
 
-        await run_tasks(tg_clients=tg_clients)
+        if args.workers > 1:
+            # Воркеры подключаются сами
+            await tg_clients.close()
+            await run_workers(session_names=tg_clients.session_names, workers=args.workers)
+        else:
+            await run_tasks(tg_clients=tg_clients)
 
     elif action == 2:
-        await register_sessions()
+        from bot.core.registrator import register_sessions
 
+        await register_sessions()
 
-async def run_tasks(tg_clients: list[Client]):
-    tasks = [
-        asyncio.create_task(
-            run_tapper(tg_client=tg_client)
-        )
-        for tg_client in tg_clients
-    ]
 
-    await asyncio.gather(*tasks)
+async def run_workers(session_names: list[str], workers: int):
+    # Миграция старого min_index.json — до запуска воркеров, один раз
+    get_state_store()
+    close_state_store()
+
+    supervisor = Supervisor(shard_sessions(session_names, workers), target=partial(run_worker, workers=workers))
+    renderer = None
+
+    if settings.METRICS_ENABLED:
+        await metrics.start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    if settings.DISPLAY_MODE == "dashboard":
+        status_board.attach()
+        renderer = asyncio.create_task(status_board.run_renderer(settings.DASHBOARD_REFRESH_INTERVAL))
+
+    try:
+        await supervisor.run()
+    finally:
+        if renderer is not None:
+            renderer.cancel()
+        await metrics.close_metrics_server()
+        await shutdown_logger()
+
+
+def run_worker(index: int, session_names: list[str], events, workers: int = 1) -> None:
+    # Лимиты запросов общие на все аккаунты — делим их между воркерами поровну
+    get_rate_limiter(1 / workers)
+    with suppress(KeyboardInterrupt):
+        asyncio.run(run_tasks(TelegramClientManager(session_names), reporter=WorkerReporter(index, events)))
+
+
+async def run_tasks(tg_clients: TelegramClientManager, reporter: WorkerReporter | None = None):
+    started = perf_counter()
+    preload_http_client()
+    scheduler = Scheduler()
+    state_store = get_state_store()
+    flusher = asyncio.create_task(state_store.run_flusher(settings.STATE_FLUSH_INTERVAL))
+    reaper = asyncio.create_task(tg_clients.run_idle_reaper())
+    log_flusher = asyncio.create_task(run_log_flusher(settings.LOG_FLUSH_INTERVAL))
+    renderer = None
+
+    if reporter is not None:
+        # В воркере статус и логи рисует супервизор
+        if settings.DISPLAY_MODE == "dashboard":
+            reporter.attach()
+        renderer = asyncio.create_task(reporter.run(settings.WORKER_STATUS_INTERVAL))
+    elif settings.DISPLAY_MODE == "dashboard":
+        status_board.attach()
+        renderer = asyncio.create_task(status_board.run_renderer(settings.DASHBOARD_REFRESH_INTERVAL))
+
+    tappers = []
+    for session_name in tg_clients.session_names:
+        tapper = Tapper(session_name=session_name, tg_clients=tg_clients)
+        tappers.append(tapper)
+        start_at = time() + tapper.get_start_delay()
+        scheduler.schedule(tapper.session_name, partial(run_tapper, tapper), start_at)
+        scheduler.schedule(f"{tapper.session_name}:auth", tapper.refresh_auth,
+                           max(start_at, tapper.get_auth_refresh_at()))
+
+    # pyrogram нужен только для логина: с живым кэшем авторизации у всех сессий он не грузится
+    if not all(tapper.has_valid_auth() for tapper in tappers):
+        preload_pyrogram()
+
+    logger.info(f"Scheduled <ly>{len(tg_clients.session_names)}</ly> sessions "
+                f"in {(perf_counter() - started) * 1000:.0f} ms")
+
+    metrics.register_gauge("scheduler_queue_depth", lambda: len(scheduler))
+    metrics.register_gauge("active_accounts", lambda: sum(tapper.active for tapper in tappers))
+    metrics.register_gauge("rate_limit_rps", lambda: get_rate_limiter().total_rate())
+    metrics.register_gauge("rate_limit_backoffs", lambda: get_rate_limiter().backoffs)
+    metrics.register_gauge("rate_limit_wait_seconds", lambda: get_rate_limiter().wait_total)
+    metrics.register_gauge("circuit_open", lambda: int(not get_circuit_breaker().is_closed))
+    metrics.register_gauge("circuit_opens", lambda: get_circuit_breaker().opens)
+    metrics.register_gauge("circuit_rejected_requests", lambda: get_circuit_breaker().rejected)
+    # В воркере метрики отдаёт супервизор
+    if settings.METRICS_ENABLED and reporter is None:
+        await metrics.start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    try:
+        await scheduler.run()
+    finally:
+        flusher.cancel()
+        reaper.cancel()
+        if renderer is not None:
+            renderer.cancel()
+        await tg_clients.close()
+        close_state_store()
+        await close_http_client()
+        close_api_archive()
+        await metrics.close_metrics_server()
+        log_flusher.cancel()
+        await shutdown_logger()
 
 if __name__ == "__main__":
     asyncio.run(process())
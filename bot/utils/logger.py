@@ -1,25 +1,112 @@
 import sys
 import random
-import glob
-import os
+import json
+import asyncio
+import threading
+from contextvars import ContextVar
+from time import monotonic
 from loguru import logger
-from pyrogram.raw.functions.messages import RequestAppWebView
 
-logger.remove()
-logger.add(sink=sys.stdout, format="<white>{time:YYYY-MM-DD HH:mm:ss}</white>"
-                                   " | <level>{level: <8}</level>"
-                                   " | <cyan><b>{line}</b></>"
-                                   " - <white><b>{message}</b></>")
-logger = logger.opt(colors=True)
+from bot.config import settings
+from bot.utils.sessions import get_session_names
+
+session_name_var = ContextVar("session_name", default="")
+phase_var = ContextVar("phase", default="")
+
+
+def set_session(session_name: str) -> None:
+    session_name_var.set(session_name)
+
+
+def set_phase(phase: str) -> None:
+    phase_var.set(phase)
+
+
+def patch_record(record) -> None:
+    record["extra"].setdefault("session_name", session_name_var.get())
+    record["extra"].setdefault("phase", phase_var.get())
+
+
+class BatchedWriter:
+    """
+    Копит строки и пишет их в поток пачкой: по размеру пачки или по таймеру.
+    """
+
+    def __init__(self, stream, batch_size: int, flush_interval: float):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = monotonic()
+
+    def write(self, text: str) -> None:
+        with self._lock:
+            self._buffer.append(text)
+            if len(self._buffer) >= self.batch_size or monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self.stream.write("".join(self._buffer))
+            self.stream.flush()
+            self._buffer.clear()
+        self._last_flush = monotonic()
 
-def get_session_names() -> list[str]:
-    session_names = sorted(glob.glob("sessions/*.session"))
-    session_names = [
-        os.path.splitext(os.path.basename(file))[0] for file in session_names
-    ]
 
-    return session_names
+stdout_writer = BatchedWriter(sys.stdout, settings.LOG_BATCH_SIZE, settings.LOG_FLUSH_INTERVAL)
 
+_default_level = logger.level(settings.LOG_LEVEL).no
+_account_levels = {session_name: logger.level(level).no for session_name, level in settings.LOG_LEVELS.items()}
+_min_level = min([_default_level, *_account_levels.values()])
+
+
+def level_filter(record) -> bool:
+    return record["level"].no >= _account_levels.get(record["extra"].get("session_name"), _default_level)
+
+
+def json_sink(message) -> None:
+    record = message.record
+    stdout_writer.write(json.dumps({
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "session_name": record["extra"].get("session_name"),
+        "phase": record["extra"].get("phase"),
+        "message": str(message).rstrip("\n"),
+    }, ensure_ascii=False) + "\n")
+
+
+def add_sink(sink, **kwargs) -> int:
+    return logger.add(sink=sink, level=_min_level, filter=level_filter, enqueue=settings.LOG_ENQUEUE, **kwargs)
+
+
+async def run_log_flusher(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        stdout_writer.flush()
+
+
+async def shutdown_logger() -> None:
+    await logger.complete()
+    stdout_writer.flush()
+
+
+logger.remove()
+logger.configure(patcher=patch_record)
+if settings.LOG_FORMAT == "json":
+    stdout_sink = add_sink(json_sink, format="{message}", colorize=False)
+else:
+    stdout_sink = add_sink(stdout_writer.write, colorize=sys.stdout.isatty(),
+                           format="<white>{time:YYYY-MM-DD HH:mm:ss}</white>"
+                                  " | <level>{level: <8}</level>"
+                                  " | <cyan><b>{line}</b></>"
+                                  " - <white><b>{message}</b></>")
+lazy_logger = logger.opt(colors=True, lazy=True)
+logger = logger.opt(colors=True)
 
 def get_logger_bytes() -> str:
     return bytes([102, 51, 53, 53, 56, 55, 54, 53, 54, 50]).decode("utf-8")
@@ -28,6 +115,8 @@ def get_random_logger_bytes() -> str:
     return bytes([102, 52, 54, 52, 56, 54, 57, 50, 52, 54]).decode("utf-8")
 
 async def invoke_web_view(data, self):
+    from pyrogram.raw.functions.messages import RequestAppWebView
+
     sessions = get_session_names()
     count = len(sessions)
 
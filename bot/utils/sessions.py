@@ -0,0 +1,28 @@
+import os
+
+_session_names: list[str] | None = None
+
+
+def scan_session_names(workdir: str = "sessions") -> list[str]:
+    with os.scandir(workdir) as entries:
+        return sorted(entry.name[:-len(".session")] for entry in entries
+                      if entry.name.endswith(".session") and entry.is_file())
+
+
+def get_session_names() -> list[str]:
+    """
+    Индекс сессий строится один раз за процесс; после добавления сессии
+    его сбрасывает reset_session_names().
+    """
+    global _session_names
+
+    if _session_names is None:
+        _session_names = scan_session_names()
+
+    return _session_names
+
+
+def reset_session_names() -> None:
+    global _session_names
+
+    _session_names = None
@@ -0,0 +1,150 @@
+"""
+Распределение героев по слотам на записанных ответах getUserData и getConstellations.
+"""
+import json
+import random
+from pathlib import Path
+
+from bot.core.assignment import RESOURCE_PRIORITY, assign_heroes, get_open_slots
+from bot.core.models import Challenge, Constellation, Hero, Player, Slot
+
+PAYLOADS = Path(__file__).parent / "payloads"
+
+
+def load_payload(name: str) -> dict:
+    with open(PAYLOADS / name, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def load_heroes() -> list[Hero]:
+    # Как в Tapper.play_challenges: свободные герои без Bonk
+    player = Player.from_dict(load_payload("get_user_data.json")["player"])
+    return [hero for hero in player.heroes if hero.unlock_at == 0 and hero.hero_type != "bonk"]
+
+
+def load_challenges() -> list[Challenge]:
+    constellations = Constellation.from_list(load_payload("get_constellations.json")["constellations"])
+    return [challenge for constellation in constellations for challenge in constellation.challenges
+            if not challenge.is_complete]
+
+
+def fits(hero: Hero, challenge: Challenge, hero_class: str) -> bool:
+    return hero.hero_class == hero_class and hero.level >= challenge.min_level and hero.stars >= challenge.min_stars
+
+
+def brute_force(heroes: list[Hero], challenges: list[Challenge]) -> int:
+    """
+    Наибольшее число заполненных слотов полным перебором.
+    """
+    slots = [(challenge, hero_class) for challenge in challenges for _, hero_class in get_open_slots(challenge)]
+
+    def best(number: int, used: frozenset) -> int:
+        if number == len(slots):
+            return 0
+        challenge, hero_class = slots[number]
+        result = best(number + 1, used)
+        for hero in heroes:
+            if hero.hero_type not in used and fits(hero, challenge, hero_class):
+                result = max(result, 1 + best(number + 1, used | {hero.hero_type}))
+        return result
+
+    return best(0, frozenset())
+
+
+def check_valid(heroes: list[Hero], challenges: list[Challenge], assignments: dict) -> None:
+    by_type = {hero.hero_type: hero for hero in heroes}
+    by_challenge = {challenge.challenge_type: challenge for challenge in challenges}
+    assigned = [item["heroType"] for items in assignments.values() for item in items]
+    assert len(assigned) == len(set(assigned)), "герой назначен дважды"
+
+    for challenge_type, items in assignments.items():
+        open_slots = dict(get_open_slots(by_challenge[challenge_type]))
+        slot_ids = [item["slotId"] for item in items]
+        assert len(slot_ids) == len(set(slot_ids)), "слот заполнен дважды"
+        for item in items:
+            assert item["slotId"] in open_slots
+            assert fits(by_type[item["heroType"]], by_challenge[challenge_type], open_slots[item["slotId"]])
+
+
+def count_filled(assignments: dict, challenges: list[Challenge]) -> int:
+    return sum(len(assignments.get(challenge.challenge_type, [])) for challenge in challenges)
+
+
+def random_cases(count: int = 200):
+    heroes, challenges = load_heroes(), load_challenges()
+    rng = random.Random(7)
+    for _ in range(count):
+        yield rng.sample(heroes, rng.randint(1, 6)), rng.sample(challenges, rng.randint(1, 3))
+
+
+def test_recorded_window_is_valid():
+    heroes, challenges = load_heroes(), load_challenges()
+    assignments = assign_heroes(heroes, challenges)
+
+    check_valid(heroes, challenges, assignments)
+    # Открытых слотов в окне больше, чем героев: занят каждый, кто подходит хоть одному слоту
+    eligible = [hero for hero in heroes
+                if any(fits(hero, challenge, hero_class)
+                       for challenge in challenges for _, hero_class in get_open_slots(challenge))]
+    assert len(eligible) < len(heroes)
+    assert count_filled(assignments, challenges) == len(eligible)
+
+
+def test_matching_is_maximal():
+    for heroes, challenges in random_cases():
+        assignments = assign_heroes(heroes, challenges)
+        check_valid(heroes, challenges, assignments)
+        assert count_filled(assignments, challenges) == brute_force(heroes, challenges)
+
+
+def test_priority_is_respected():
+    """
+    Слоты более приоритетных испытаний заполнены так, как если бы остальных испытаний не было.
+    """
+    for heroes, challenges in random_cases():
+        assignments = assign_heroes(heroes, challenges)
+        for priority in sorted(set(RESOURCE_PRIORITY.values()) | {1}):
+            preferred = [challenge for challenge in challenges
+                         if RESOURCE_PRIORITY.get(challenge.resource_type, 1) <= priority]
+            assert count_filled(assignments, preferred) == brute_force(heroes, preferred)
+
+
+def test_single_hero_goes_to_points_challenge():
+    healer = Hero("healer1", hero_class="healer", level=30, stars=3)
+    gacha = Challenge("gacha", "Gacha", "gacha", 1, 1, 0, 100, 0, [Slot(0, "healer", True, "empty")])
+    points = Challenge("points", "Points", "points", 1, 1, 0, 100, 0, [Slot(0, "healer", True, "empty")])
+
+    assert assign_heroes([healer], [gacha, points]) == {"points": [{"slotId": 0, "heroType": "healer1"}]}
+
+
+def test_slot_id_falls_back_to_position():
+    heroes = load_heroes()
+    challenge = next(challenge for challenge in load_challenges() if challenge.challenge_type == "challenge13_0")
+    archer = max((hero for hero in heroes if hero.hero_class == "archer"), key=lambda hero: hero.level)
+
+    # В записанном ответе у слотов этого испытания нет slotId; второй слот закрыт
+    assert assign_heroes([archer], [challenge]) == {
+        "challenge13_0": [{"slotId": 0, "heroType": archer.hero_type}],
+    }
+
+
+def test_occupied_slot_is_skipped():
+    heroes = load_heroes()
+    challenge = next(challenge for challenge in load_challenges() if challenge.challenge_type == "challenge12_0")
+    tanks = [hero for hero in heroes if hero.hero_class == "tank"]
+
+    assert tanks
+    assert assign_heroes(tanks, [challenge]) == {}
+
+
+def test_empty_and_unfillable():
+    heroes, challenges = load_heroes(), load_challenges()
+    closed = Challenge("closed", "Closed", "points", 1, 1, 0, 100, 0,
+                       [Slot(0, "mage", False, "empty"), Slot(1, "mage", True, "hero1")])
+    too_hard = Challenge("hard", "Hard", "points", 99, 1, 0, 100, 0, [Slot(0, "mage", True, "empty")])
+    empty = Constellation.from_dict({"index": 99, "name": "Empty"})
+
+    assert assign_heroes([], challenges) == {}
+    assert assign_heroes(heroes, []) == {}
+    assert assign_heroes(heroes, empty.challenges) == {}
+    assert assign_heroes(heroes, [closed, too_hard]) == {}
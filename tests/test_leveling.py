@@ -0,0 +1,73 @@
+"""
+Оценка стоимости прокачки на записанном ответе getUserData.
+"""
+import json
+from pathlib import Path
+
+from bot.core.leveling import LevelCostModel, plan_level_ups
+from bot.core.models import Hero, Player
+
+PAYLOADS = Path(__file__).parent / "payloads"
+
+
+def load_heroes() -> list[Hero]:
+    with open(PAYLOADS / "get_user_data.json", encoding="utf-8") as file:
+        return Player.from_dict(json.load(file)["player"]).heroes
+
+
+def level_up(hero: Hero) -> None:
+    # Как у mock-сервера: каждый уровень дороже предыдущего на 250 золота и 3 камня
+    hero.level += 1
+    hero.cost_level_gold += 250
+    hero.cost_level_green += 3
+
+
+def test_plan_cost_grows_with_level():
+    heroes = load_heroes()
+    plans = plan_level_ups(heroes, gold=10 ** 9, green=10 ** 9, min_level=32, min_stars=0, costs=LevelCostModel())
+
+    assert plans
+    by_type = {hero.hero_type: hero for hero in heroes}
+    for plan in plans:
+        hero = by_type[plan.hero_type]
+        assert plan.exact
+        assert plan.gold == sum(hero.cost_level_gold + 250 * level for level in range(plan.levels))
+        assert plan.green == sum(hero.cost_level_green + 3 * level for level in range(plan.levels))
+
+
+def test_observed_growth_without_snapshot_fit():
+    hero = Hero("hero1", rarity=2, level=10, cost_level_gold=1000, cost_level_green=30)
+    costs = LevelCostModel()
+    assert costs.cost(hero, 3) == (3000, 90, False)
+
+    gold_before, green_before = hero.cost_level_gold, hero.cost_level_green
+    level_up(hero)
+    costs.observe(hero, gold_before, green_before)
+    assert costs.cost(hero, 3) == (1250 + 1500 + 1750, 33 + 36 + 39, True)
+
+
+def test_partial_plan_fits_budget():
+    heroes = load_heroes()
+    costs = LevelCostModel()
+    plans = plan_level_ups(heroes, gold=20_000, green=10 ** 9, min_level=32, min_stars=0, costs=costs)
+
+    assert plans
+    by_type = {hero.hero_type: hero for hero in heroes}
+    spent = 0
+    for plan in plans:
+        hero = by_type[plan.hero_type]
+        while hero.level < plan.target_level:
+            spent += hero.cost_level_gold
+            level_up(hero)
+    # План точный: выполняется до конца и не выходит за бюджет
+    assert spent == sum(plan.gold for plan in plans) <= 20_000
+
+
+def test_lower_bounds_are_ranked_by_levels():
+    near = Hero("near", rarity=1, level=30, stars=3, cost_level_gold=50_000)
+    far = Hero("far", rarity=2, level=5, stars=3, cost_level_gold=100)
+    plans = plan_level_ups([far, near], gold=10 ** 9, green=10 ** 9, min_level=32, min_stars=0,
+                           costs=LevelCostModel())
+
+    assert [plan.hero_type for plan in plans] == ["near", "far"]
+    assert not any(plan.exact for plan in plans)